@@ -0,0 +1,80 @@
+# Generated by Django 5.2 on 2026-10-15 09:00
+
+import json
+
+from django.db import migrations, models
+
+
+JSON_FIELDS = {
+    'location': {},
+    'edurank': {},
+    'department': {},
+    'publications': {},
+    'point_of_contact': {},
+    'scopes': [],
+    'lab_equipment': {},
+}
+
+
+def normalize_json_text(apps, schema_editor):
+    """Make every stringified-JSON column valid JSON before the type change."""
+    Entity = apps.get_model('crawler', 'Entity')
+    for entity in Entity.objects.only('id', *JSON_FIELDS).iterator():
+        updates = {}
+        for field, default in JSON_FIELDS.items():
+            raw = getattr(entity, field)
+            try:
+                value = json.loads(raw) if raw else default
+            except (TypeError, ValueError):
+                value = default
+            normalized = json.dumps(value)
+            if normalized != raw:
+                updates[field] = normalized
+        if updates:
+            Entity.objects.filter(id=entity.id).update(**updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crawler', '0003_session_delete_config_entity_session'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_json_text, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='entity',
+            name='department',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='entity',
+            name='edurank',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='entity',
+            name='lab_equipment',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='entity',
+            name='location',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='entity',
+            name='point_of_contact',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='entity',
+            name='publications',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='entity',
+            name='scopes',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
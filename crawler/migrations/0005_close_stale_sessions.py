@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-15 10:00
+
+from django.db import migrations
+
+
+def close_stale_sessions(apps, schema_editor):
+    """Sessions created before status tracking never left 'running'; mark them finished."""
+    Session = apps.get_model('crawler', 'Session')
+    Session.objects.filter(status='running').update(status='completed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crawler', '0004_entity_json_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(close_stale_sessions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-15 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crawler', '0005_close_stale_sessions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entity',
+            index=models.Index(fields=['session', 'id'], name='entity_session_id_idx'),
+        ),
+    ]
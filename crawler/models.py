@@ -1,5 +1,4 @@
 from django.db import models
-import json
 
 class Session(models.Model):
     start_time = models.DateTimeField(auto_now_add=True)
@@ -10,24 +9,20 @@ class Entity(models.Model):
     session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name='entities', null=True, blank=True)
     url = models.URLField(unique=True)
     university = models.TextField(blank=True)
-    location = models.TextField(blank=True)  # JSON string
+    location = models.JSONField(default=dict, blank=True)
     website = models.URLField(blank=True)
-    edurank = models.TextField(blank=True)   # JSON string
-    department = models.TextField(blank=True)  # JSON string
-    publications = models.TextField(blank=True)  # JSON string
+    edurank = models.JSONField(default=dict, blank=True)
+    department = models.JSONField(default=dict, blank=True)
+    publications = models.JSONField(default=dict, blank=True)
     related = models.TextField(blank=True)
-    point_of_contact = models.TextField(blank=True)  # JSON string
-    scopes = models.TextField(blank=True)    # JSON string
+    point_of_contact = models.JSONField(default=dict, blank=True)
+    scopes = models.JSONField(default=list, blank=True)
     research_abstract = models.TextField(blank=True)
-    lab_equipment = models.TextField(blank=True)  # JSON string
+    lab_equipment = models.JSONField(default=dict, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
-    def set_json_field(self, field_name, value):
-        setattr(self, field_name, json.dumps(value))
-
-    def get_json_field(self, field_name):
-        value = getattr(self, field_name)
-        return json.loads(value) if value else ({} if 'scopes' not in field_name else [])
-
     class Meta:
-        db_table = 'entities'
\ No newline at end of file
+        db_table = 'entities'
+        indexes = [
+            models.Index(fields=['session', 'id'], name='entity_session_id_idx'),
+        ]
\ No newline at end of file
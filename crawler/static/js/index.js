@@ -126,6 +126,8 @@ if (searchForm) {
   const stopBtn = document.getElementById("stop-crawler-btn");
   
   let crawlerInterval; // Declare this variable outside any function
+  let logOffset = null; // Byte offset into crawler.log already shown
+  let stopRequested = false;
   
   
   function updateCrawlerStatus() {
@@ -136,30 +138,60 @@ if (searchForm) {
           runBtn.style.display = "none";
           stopBtn.style.display = "inline-block";
           startLogPolling();
+        } else if (data.is_stopping) {
+          // Worker is still winding down; check again shortly
+          stopBtn.style.display = "none";
+          runBtn.style.display = "none";
+          setTimeout(updateCrawlerStatus, 1000);
         } else {
           stopBtn.style.display = "none";
           runBtn.style.display = "inline-block";
           if (crawlerInterval) clearInterval(crawlerInterval);
+          if (stopRequested) {
+            stopRequested = false;
+            addLogEntry("Crawler system halted", "error");
+          }
         }
       });
   }
   
+  function showLogLine(log) {
+    const type = log.includes("ERROR")
+      ? "error"
+      : log.includes("WARNING")
+      ? "warning"
+      : log.includes("SUCCESS")
+      ? "success"
+      : "info";
+    addLogEntry(log, type);
+  }
+
+  // get_logs returns one {"line": ...} object per line (NDJSON)
+  async function readLogStream(response) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffered += decoder.decode(value, { stream: true });
+      const lines = buffered.split("\n");
+      buffered = lines.pop();
+      lines.filter(Boolean).forEach((line) => showLogLine(JSON.parse(line).line));
+    }
+    if (buffered) showLogLine(JSON.parse(buffered).line);
+  }
+
   function startLogPolling() {
     crawlerInterval = setInterval(() => {
-      fetch(getLogsUrl)
-        .then((response) => response.json())
-        .then((data) => {
-          data.logs.forEach((log) => {
-            const type = log.includes("ERROR")
-              ? "error"
-              : log.includes("WARNING")
-              ? "warning"
-              : log.includes("SUCCESS")
-              ? "success"
-              : "info";
-            addLogEntry(log, type);
-          });
-        });
+      const url = logOffset === null ? getLogsUrl : `${getLogsUrl}?offset=${logOffset}`;
+      fetch(url)
+        .then((response) => {
+          if (!response.ok) return;
+          logOffset = response.headers.get("X-Log-Offset");
+          return readLogStream(response);
+        })
+        .catch((error) => console.error("Error reading logs:", error));
     }, 1500);
   }
   
@@ -179,7 +211,7 @@ if (searchForm) {
   stopBtn.addEventListener("click", () => {
     addLogEntry("Initiating emergency stop procedure...", "warning");
     fetch(stopCrawlerUrl).then(() => {
-      addLogEntry("Crawler system halted", "error");
+      stopRequested = true;
       updateCrawlerStatus();
     });
   });
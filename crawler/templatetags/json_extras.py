@@ -4,15 +4,8 @@ from django import template
 register = template.Library()
 
 @register.filter
-def get_json_field(entity, field_name):
+def to_json(value):
     """
-    A template filter that retrieves and parses a JSON field from an entity.
+    A template filter that renders a JSONField value as editable JSON text.
     """
-    value = getattr(entity, field_name, None)
-    if value:
-        try:
-            return json.loads(value)
-        except Exception:
-            return {}
-    # Return an empty list for 'scopes', or an empty dict for other fields.
-    return [] if field_name == "scopes" else {}
+    return json.dumps(value, indent=2, ensure_ascii=False)
@@ -1,3 +1,300 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from crawler import views
+from crawler.models import Entity, Session
+from utils import state
+from utils.online_crawler_model import OnlineLearningCrawler
+from utils.workflow import _add_or_clear
+
+
+def _ndjson(response):
+    return [json.loads(line)['line'] for line in response.content.decode().splitlines()]
+
+
+class DeleteViewsTests(TestCase):
+    def setUp(self):
+        self.entities = [Entity.objects.create(url=f'https://lab{i}.edu', university=f'Uni {i}') for i in range(3)]
+
+    def test_delete_row_requires_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        response = client.post(reverse('delete_row', args=[self.entities[0].id]), HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(Entity.objects.filter(id=self.entities[0].id).exists())
+
+    def test_delete_row_with_csrf_token_returns_json(self):
+        client = Client(enforce_csrf_checks=True)
+        client.get(reverse('index'))
+        token = client.cookies['csrftoken'].value
+        response = client.post(reverse('delete_row', args=[self.entities[0].id]), HTTP_ACCEPT='application/json', HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok', 'deleted': 1})
+        self.assertFalse(Entity.objects.filter(id=self.entities[0].id).exists())
+
+    def test_delete_row_missing_id_is_json_404(self):
+        response = self.client.post(reverse('delete_row', args=[999999]), HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['status'], 'error')
+
+    def test_delete_row_form_post_redirects(self):
+        response = self.client.post(reverse('delete_row', args=[self.entities[0].id]))
+        self.assertRedirects(response, reverse('database'), fetch_redirect_response=False)
+
+    def test_delete_selected_json_ids(self):
+        ids = [self.entities[0].id, self.entities[1].id]
+        response = self.client.post(reverse('delete_selected'), data=json.dumps({'ids': ids}),
+                                    content_type='application/json', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json(), {'status': 'ok', 'deleted': 2})
+        self.assertEqual(list(Entity.objects.values_list('id', flat=True)), [self.entities[2].id])
+
+    def test_delete_selected_rejects_invalid_ids(self):
+        response = self.client.post(reverse('delete_selected'), data=json.dumps({'ids': ['x']}),
+                                    content_type='application/json', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Entity.objects.count(), 3)
+
+    def test_delete_selected_rejects_invalid_json(self):
+        response = self.client.post(reverse('delete_selected'), data='{not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_delete_selected_body_size_limit(self):
+        response = self.client.post(reverse('delete_selected'), data=json.dumps({'ids': [1]}),
+                                    content_type='application/json', CONTENT_LENGTH=str(views.DELETE_MAX_BODY_BYTES + 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Entity.objects.count(), 3)
+
+    def test_delete_selected_malformed_content_length(self):
+        response = self.client.post(reverse('delete_selected'), data=json.dumps({'ids': [1]}),
+                                    content_type='application/json', CONTENT_LENGTH='abc')
+        self.assertEqual(response.status_code, 400)
+
+    def test_edit_row_missing_id_is_json_404(self):
+        response = self.client.post(reverse('edit_row', args=[999999]), {'university': 'X'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['status'], 'error')
+
+    def test_edit_row_rejects_invalid_json_field(self):
+        entity = self.entities[0]
+        response = self.client.post(reverse('edit_row', args=[entity.id]), {'location': '{bad'}, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['field'], 'location')
+
+
+class GetLogsTests(TestCase):
+    def setUp(self):
+        fd, self.log_file = tempfile.mkstemp(suffix='.log')
+        os.close(fd)
+        self.addCleanup(os.remove, self.log_file)
+        patcher = mock.patch.object(views, 'LOG_FILE', self.log_file)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        views._LOG_CACHE.clear()
+
+    def write(self, text, mode='w'):
+        with open(self.log_file, mode, encoding='utf-8') as f:
+            f.write(text)
+
+    def test_missing_log(self):
+        with mock.patch.object(views, 'LOG_FILE', self.log_file + '.missing'):
+            response = self.client.get(reverse('get_logs'))
+        self.assertEqual(_ndjson(response), ['No logs available yet.'])
+        self.assertEqual(response['X-Log-Offset'], '0')
+
+    def test_tail_and_offset(self):
+        self.write('one\ntwo\nthree\n')
+        response = self.client.get(reverse('get_logs'), {'tail': 2})
+        self.assertEqual(_ndjson(response), ['two\n', 'three\n'])
+        offset = response['X-Log-Offset']
+        self.assertEqual(int(offset), len('one\ntwo\nthree\n'))
+
+        self.write('four\nfive', mode='a')
+        response = self.client.get(reverse('get_logs'), {'offset': offset})
+        # The unterminated last line waits for the next poll
+        self.assertEqual(_ndjson(response), ['four\n'])
+        self.assertEqual(int(response['X-Log-Offset']), len('one\ntwo\nthree\nfour\n'))
+
+    def test_truncated_window_drops_partial_first_line(self):
+        line = 'x' * 99 + '\n'
+        self.write(line * (views.LOG_TAIL_BYTES // len(line) + 10))
+        response = self.client.get(reverse('get_logs'))
+        lines = _ndjson(response)
+        self.assertTrue(lines)
+        self.assertTrue(all(entry == line for entry in lines))
+
+    def test_etag_not_modified(self):
+        self.write('one\n')
+        response = self.client.get(reverse('get_logs'))
+        etag = response['ETag']
+        response = self.client.get(reverse('get_logs'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.write('two\n', mode='a')
+        response = self.client.get(reverse('get_logs'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class IndexConditionalGetTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(views.time, 'time', return_value=1_700_000_000.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_not_modified_until_session_changes(self):
+        session = Session.objects.create()
+        self.client.get(reverse('index'))  # sets the CSRF cookie, which is part of the ETag
+        response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Session.objects.filter(id=session.id).update(status='completed', end_time=timezone.now())
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class FilesViewTests(TestCase):
+    def test_rejects_files_outside_allow_list(self):
+        for filename in ('urls.txt', '../labs_startups/settings.py', ''):
+            response = self.client.post(reverse('files'), {'filename': filename, 'content': 'x'})
+            self.assertEqual(response.status_code, 400, filename)
+
+    def test_directories_rewrite_universities(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            editable = {name: Path(tmp) / name for name in views._EDITABLE_FILES}
+            with mock.patch.dict(views._EDITABLE_FILES, editable):
+                content = 'https://www.knust.edu.gh/research\nug.edu.gh/labs\nnot a url\n'
+                response = self.client.post(reverse('files'), {'filename': 'potential_directories.txt', 'content': content})
+                self.assertEqual(response.status_code, 302)
+                self.assertEqual(editable['potential_directories.txt'].read_text(encoding='utf-8'), content)
+                self.assertEqual(editable['universities.txt'].read_text(encoding='utf-8').split(), ['knust.edu.gh', 'ug.edu.gh'])
+
+
+class StopCrawlerTests(TestCase):
+    def setUp(self):
+        state.crawler_running_event.clear()
+        state.set_crawl_session(None)
+        self.addCleanup(state.set_crawl_session, None)
+        self.addCleanup(state.crawler_running_event.clear)
+
+    def test_idle_when_nothing_runs(self):
+        quick = Session.objects.create()  # quick scrapes stay 'running' but are not crawls
+        response = self.client.post(reverse('stop_crawler'))
+        self.assertEqual(response.json()['status'], 'not_running')
+        self.assertEqual(Session.objects.get(id=quick.id).status, 'running')
+
+    def test_flags_only_the_crawl_session(self):
+        quick = Session.objects.create()
+        crawl = Session.objects.create()
+        state.set_crawl_session(crawl.id)
+        state.crawler_running_event.set()
+        response = self.client.post(reverse('stop_crawler'))
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Session.objects.get(id=crawl.id).status, 'stopping')
+        self.assertEqual(Session.objects.get(id=quick.id).status, 'running')
+        self.assertFalse(state.crawler_running_event.is_set())
+
+
+class MigrationTests(TransactionTestCase):
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('crawler', target)])
+        return executor.loader.project_state([('crawler', target)]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_0004_normalizes_json_text(self):
+        apps = self.migrate('0003_session_delete_config_entity_session')
+        OldEntity = apps.get_model('crawler', 'Entity')
+        entity = OldEntity.objects.create(
+            url='https://lab.edu', location='{"city": "Accra"}', edurank='not json', department='',
+            publications='{}', point_of_contact='{}', scopes='["AI"]', lab_equipment='{}',
+        )
+
+        apps = self.migrate('0004_entity_json_fields')
+        migrated = apps.get_model('crawler', 'Entity').objects.get(id=entity.id)
+        self.assertEqual(migrated.location, {'city': 'Accra'})
+        self.assertEqual(migrated.edurank, {})
+        self.assertEqual(migrated.department, {})
+        self.assertEqual(migrated.scopes, ['AI'])
+
+    def test_0005_closes_stale_sessions(self):
+        apps = self.migrate('0004_entity_json_fields')
+        OldSession = apps.get_model('crawler', 'Session')
+        stale = OldSession.objects.create()
+        stopped = OldSession.objects.create(status='stopped')
+
+        apps = self.migrate('0005_close_stale_sessions')
+        NewSession = apps.get_model('crawler', 'Session')
+        self.assertEqual(NewSession.objects.get(id=stale.id).status, 'completed')
+        self.assertEqual(NewSession.objects.get(id=stopped.id).status, 'stopped')
+
+
+class HelperTests(SimpleTestCase):
+    def test_add_or_clear(self):
+        self.assertEqual(_add_or_clear([{'url': 'a'}], [{'url': 'b'}]), [{'url': 'a'}, {'url': 'b'}])
+        self.assertEqual(_add_or_clear([{'url': 'a'}], None), [])
+
+    def test_url_input_detection(self):
+        for text in ('knust.edu.gh/research', 'https://x.edu/a b', 'my_host.example.com', 'localhost:8000'):
+            self.assertTrue(views._FAST_HOST_RE.match(text), text)
+        for text in ('robotics labs at https://x.edu', 'University of Ghana', 'ftp://x.edu'):
+            self.assertFalse(views._FAST_HOST_RE.match(text), text)
+
+    def test_validated_json(self):
+        self.assertEqual(views._validated_json('', {}), {})
+        self.assertEqual(views._validated_json('["a"]', []), ['a'])
+        with self.assertRaises(ValueError):
+            views._validated_json('{bad', {})
+
+
+class OnlineLearningCrawlerTests(SimpleTestCase):
+    ITEMS = [
+        ('https://x.edu/research/lab?a=1', 'Research Lab', 0.7),
+        ('http://y.com/file.PDF', '', 0.0),
+        ('https://z.org/startup-funding/energy', 'Energy Funding centre', 1.0),
+    ]
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with mock.patch('builtins.print'):
+            self.learner = OnlineLearningCrawler(
+                model_file=os.path.join(tmp.name, 'model.pkl'),
+                scaler_file=os.path.join(tmp.name, 'scaler.pkl'),
+                updates_file=os.path.join(tmp.name, 'updates.pkl'),
+            )
+        # Nothing to save once the temporary directory is gone
+        self.addCleanup(setattr, self.learner, 'unsaved_updates', 0)
+
+    def test_untrained_model_predicts_half(self):
+        self.assertEqual(list(self.learner.predict_batch(self.ITEMS)), [0.5, 0.5, 0.5])
+
+    def test_predict_batch_matches_predict(self):
+        with mock.patch('builtins.print'):
+            for (url, anchor_text, relevance), label in zip(self.ITEMS, (1, 0, 1)):
+                self.learner.update_model(url, anchor_text, relevance, label)
+        batch = self.learner.predict_batch(self.ITEMS)
+        self.assertEqual(batch.shape, (3,))
+        for item, prob in zip(self.ITEMS, batch):
+            self.assertAlmostEqual(self.learner.predict(*item), prob)
+        self.assertEqual(self.learner.predict_batch([]).shape, (0,))
+
+    def test_extract_features_matches_matrix(self):
+        matrix = self.learner._feature_matrix(self.ITEMS)
+        for item, row in zip(self.ITEMS, matrix):
+            features = self.learner.extract_features(*item)
+            self.assertEqual([features[name] for name in OnlineLearningCrawler.FEATURE_NAMES], list(row))
+        self.assertEqual(self.learner.extract_features(*self.ITEMS[0])['high_priority_keyword_count'], 10)
@@ -1,4 +1,3 @@
-from django.contrib import admin
 from django.urls import path
 from crawler import views
 
@@ -8,6 +7,7 @@ urlpatterns = [
     path('parameters/', views.parameters, name='parameters'),
     path('files/', views.files, name='files'),
     path('database/', views.database, name='database'),
+    path('entity/<int:id>/', views.entity_detail, name='entity_detail'),
     path('edit/<int:id>/', views.edit_row, name='edit_row'),
     path('delete/<int:id>/', views.delete_row, name='delete_row'),
     path('delete_all/',      views.delete_all,      name='delete_all'),
@@ -1,25 +1,40 @@
 import asyncio
-from django.shortcuts import render, redirect
-from django.http import HttpResponseRedirect, JsonResponse, HttpResponse, StreamingHttpResponse
+import atexit
+import hashlib
+from django.shortcuts import get_object_or_404, render, redirect
+from django.http import Http404, HttpResponseBadRequest, HttpResponseRedirect, HttpResponseNotModified, JsonResponse, HttpResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from django.conf import settings
 from django.utils import timezone
-from django.db.models import Q
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q
+from django.core.paginator import Paginator
 import json
+import orjson
 import os
 import re
 import logging
+import mmap
+import operator
+import queue
 import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from pathlib import Path
 from asgiref.sync import sync_to_async
 from .models import Entity, Session
-from utils.helpers import generate_urls, load_seed_urls
+from utils.helpers import extract_domain, generate_urls, load_seed_urls
 from utils.config import load_config, save_config
-from utils.database import create_db
+from utils.database import clear_url_cache, create_db, prime_url_cache
+from utils.scrapers import clear_host_cache
 from utils.workflow import State, app
 from utils.scheduler import run_workflow
-from utils.state import crawler_running_event, crawler_thread
+from utils.state import crawler_running_event, _start_lock, acquire_crawler_lock, release_crawler_lock, request_stop, crawl_session, set_crawl_session
 from django.contrib import messages
-from urllib.parse import urlparse
 from duckduckgo_search import DDGS
 from groq import Groq
 
@@ -28,25 +43,138 @@ logger = logging.getLogger(__name__)
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
-CONFIG_PATH = os.path.join(BASE_DIR, 'config.json')
+CONFIG_PATH = os.path.join(DATA_DIR, 'config.json')
 LOG_FILE = os.path.join(BASE_DIR, 'crawler.log')
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+BASE_TEMPLATE = os.path.join(TEMPLATE_DIR, 'base.html')
+PARAMETERS_TEMPLATE = os.path.join(TEMPLATE_DIR, 'parameters.html')
+INDEX_TEMPLATE = os.path.join(TEMPLATE_DIR, 'index.html')
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
-
-def test_sse(request):
-    return render(request, 'test_sse.html')
-
+DELETE_BATCH_SIZE = 1000  # keeps id__in below SQLite's bound-parameter limit
+DELETE_MAX_IDS = 100_000
+DELETE_MAX_BODY_BYTES = 1 << 20
+LOG_TAIL_BYTES = 64 * 1024
+WRITE_BUFFER_BYTES = 1 << 17
+LOG_TAIL_LINES = 1000
+STOP_POLL_SECONDS = 2
+
+_LOG_CACHE = {}
+
+# Entity columns edited as plain text vs. as JSON (with the empty value's type).
+STR_FIELDS = ('university', 'website', 'related', 'research_abstract')
+JSON_FIELDS = (
+    ('location', dict), ('edurank', dict), ('department', dict), ('publications', dict),
+    ('point_of_contact', dict), ('scopes', list), ('lab_equipment', dict),
+)
+EDITABLE_FIELDS = STR_FIELDS + tuple(name for name, _ in JSON_FIELDS)
+# Entity columns returned to ai_prompt callers.
+PROMPT_RESULT_FIELDS = (
+    'university', 'location', 'website', 'edurank', 'department', 'publications', 'scopes', 'research_abstract',
+)
+
+DATA_FILES = ('universities.txt', 'potential_directories.txt', 'urls.txt')
+# Reads the data files for the files page side by side.
+_file_read_executor = ThreadPoolExecutor(max_workers=len(DATA_FILES), thread_name_prefix='data-files')
+
+# Data files the files page may overwrite; urls.txt is generated and stays read-only.
+_EDITABLE_FILES = {name: Path(DATA_DIR) / name for name in ('universities.txt', 'potential_directories.txt')}
+
+# A single long-lived worker runs crawls handed to it through this queue.
+_crawl_queue = queue.Queue()
+_crawl_busy = threading.Event()
+_crawl_worker = None
+
+# DDGS keeps an HTTP client with open connections; hold one per thread
+# instead of paying DNS + TLS setup on every search.
+_DDGS_LOCAL = threading.local()
+_DDGS_CLIENTS = []
+_DDGS_LOCK = threading.Lock()
+
+# [http(s)://]host[:port][/path] such as "knust.edu.gh/research"; anything else
+# (e.g. a sentence that merely contains a URL) is a search query.
+_FAST_HOST_RE = re.compile(r'^(?:https?://)?(?:[a-z0-9][a-z0-9_-]*(?:\.[a-z0-9][a-z0-9_-]*)+|localhost)(?::\d+)?(?:/.*)?$', re.IGNORECASE)
+_URL_SCHEMES = ('http://', 'https://')
+_TOKEN_SPLIT_RE = re.compile(r'[^a-z0-9]+')
+_JSON_BLOCK_RE = re.compile(r'\{.*?\}', re.DOTALL)
+
+# Aliases the Groq parse may return, keyed by casefolded name (read-only).
+_UNI_MAP = {
+    "university of knust": "Kwame Nkrumah University of Science and Technology",
+    "knust": "Kwame Nkrumah University of Science and Technology",
+    "university of ghana": "University of Ghana",
+    "legon": "University of Ghana",
+    "university of development studies": "University for Development Studies",
+    "uds": "University for Development Studies"
+}
+
+# Fixed SSE events sent by handle_streaming, serialized once
+_SSE_NO_QUICK_DATA = b"data: " + orjson.dumps({'status': 'quick_data', 'message': 'No quick data available', 'full_crawl_ongoing': True}) + b"\n\n"
+_SSE_QUICK_COMPLETE = b"data: " + orjson.dumps({'status': 'complete', 'message': 'Quick scrape completed', 'full_crawl_ongoing': True}) + b"\n\n"
+
+def _ddgs():
+    """Return this thread's DDGS client, creating it on first use."""
+    client = getattr(_DDGS_LOCAL, 'client', None)
+    if client is None:
+        client = _DDGS_LOCAL.client = DDGS()
+        with _DDGS_LOCK:
+            _DDGS_CLIENTS.append(client)
+    return client
+
+@atexit.register
+def _close_ddgs_clients():
+    with _DDGS_LOCK:
+        for client in _DDGS_CLIENTS:
+            try:
+                client.__exit__(None, None, None)
+            except Exception:
+                pass
+        _DDGS_CLIENTS.clear()
+
+def _index_etag(request):
+    """ETag for the dashboard: changes with the templates, config.json, the crawler state, the session list and the CSRF cookie."""
+    if request.method != 'GET':
+        return None
+    try:
+        mtimes = [os.stat(path).st_mtime_ns for path in (INDEX_TEMPLATE, BASE_TEMPLATE, CONFIG_PATH)]
+    except FileNotFoundError:
+        return None
+    crawler_state = (crawler_running_event.is_set(), _crawl_busy.is_set())
+    # end_time moves whenever a crawl finishes or is stopped
+    sessions = Session.objects.aggregate(count=Count('id'), last=Max('id'), ended=Max('end_time'))
+    # The page shows the render time and "started N minutes ago", so it goes stale after a minute.
+    minute = int(time.time() // 60)
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return hashlib.md5(f'{mtimes}-{crawler_state}-{sessions}-{minute}-{csrf}'.encode(), usedforsecurity=False).hexdigest()
+
+@cache_control(private=True, max_age=0, must_revalidate=True)
+@condition(etag_func=_index_etag)
 def index(request):
-    active_session = Session.objects.order_by('-start_time').first()
-    sessions = Session.objects.all().order_by('-start_time')
+    sessions = list(Session.objects.order_by('-start_time'))
+    active_session = sessions[0] if sessions else None
     return render(request, 'index.html', {
         'active_session': active_session,
         'sessions': sessions,
         'current_time': timezone.now()
     })
 
+def _parameters_etag(request):
+    """ETag for the parameters page: changes with the templates, config.json and the CSRF cookie."""
+    if request.method != 'GET':
+        return None
+    try:
+        mtimes = [os.stat(path).st_mtime_ns for path in (PARAMETERS_TEMPLATE, BASE_TEMPLATE, CONFIG_PATH)]
+    except FileNotFoundError:
+        return None
+    # The page embeds a CSRF token, so a new cookie must not get the cached copy.
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return hashlib.md5(f'{mtimes}-{csrf}'.encode(), usedforsecurity=False).hexdigest()
+
+@cache_control(private=True, max_age=0, must_revalidate=True)
+@condition(etag_func=_parameters_etag)
 def parameters(request):
     if request.method == 'POST':
-        print("POST received:", request.POST) 
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("POST received: %r", request.POST)
         config = {
             "REQUEST_TIMEOUT": int(request.POST.get('REQUEST_TIMEOUT', 15000)),
             "MAX_WORKERS": int(request.POST.get('MAX_WORKERS', 4)),
@@ -67,39 +195,24 @@ def search_view(request):
         if not search_input:
             return JsonResponse({'error': 'No input provided'}, status=400)
 
-        url_pattern = re.compile(
-            r'^(https?:\/\/)?'  # http:// or https://
-            r'((([A-Z0-9][A-Z0-9_-]*)(\.[A-Z0-9][A-Z0-9_-]*)+)|'  # domain...
-            r'(localhost))'  # or localhost
-            r'(:\d+)?'  # optional port
-            r'(\/.*)?$', re.IGNORECASE)
-
-        if url_pattern.match(search_input):
-            full_url = search_input if search_input.startswith('http') else 'http://' + search_input
-            domain = urlparse(full_url).netloc
+        if _FAST_HOST_RE.match(search_input):
+            full_url = search_input if search_input.lower().startswith(_URL_SCHEMES) else 'http://' + search_input
+            domain = extract_domain(full_url)
         else:
             try:
-                with DDGS() as ddgs:
-                    results = ddgs.text(search_input, max_results=1)
+                results = _ddgs().text(search_input, max_results=1)
                 if results:
                     full_url = results[0]['href']
-                    domain = urlparse(full_url).netloc
+                    domain = extract_domain(full_url)
                 else:
                     return JsonResponse({'error': 'No results found'}, status=404)
             except Exception as e:
                 return JsonResponse({'error': f'Search failed: {str(e)}'}, status=500)
 
-        domain = domain.lower()
-        if domain.startswith('www.'):
-            domain = domain[4:]
-
-        universities_file = os.path.join(DATA_DIR, 'universities.txt')
-        directories_file = os.path.join(DATA_DIR, 'potential_directories.txt')
-
         try:
-            with open(universities_file, 'w') as uni_file:
+            with open(_EDITABLE_FILES['universities.txt'], 'w', encoding='utf-8', buffering=WRITE_BUFFER_BYTES) as uni_file:
                 uni_file.write(domain + '\n')
-            with open(directories_file, 'w') as dir_file:
+            with open(_EDITABLE_FILES['potential_directories.txt'], 'w', encoding='utf-8', buffering=WRITE_BUFFER_BYTES) as dir_file:
                 dir_file.write(full_url + '\n')
         except IOError as e:
             return JsonResponse({'error': f'Failed to save to files: {str(e)}'}, status=500)
@@ -108,71 +221,62 @@ def search_view(request):
     else:
         return JsonResponse({'error': 'Invalid request method'}, status=405)
 
+def _directory_domains(lines):
+    """Yield the domain of every URL line, warning about lines that are not URLs."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if _FAST_HOST_RE.match(line):
+            yield extract_domain(line if line.lower().startswith(_URL_SCHEMES) else 'http://' + line)
+        else:
+            logger.warning(f"Invalid URL in potential_directories.txt: {line}")
+
+def _read_or_empty(path):
+    try:
+        return path.read_bytes().decode('utf-8', errors='replace')
+    except FileNotFoundError:
+        logger.warning(f"File not found: {path.name}")
+        return ''
+
 def files(request):
     if request.method == 'POST':
         filename = request.POST.get('filename')
         content = request.POST.get('content')
-        if filename != 'urls.txt':
-            file_path = os.path.join(DATA_DIR, filename)
-            try:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                
-                if filename == 'potential_directories.txt':
-                    domains = set()
-                    url_pattern = re.compile(
-                        r'^(https?:\/\/)?'  # http:// or https://
-                        r'((([A-Z0-9][A-Z0-9_-]*)(\.[A-Z0-9][A-Z0-9_-]*)+)|'  # domain...
-                        r'(localhost))'  # or localhost
-                        r'(:\d+)?'  # optional port
-                        r'(\/.*)?$', re.IGNORECASE)
-
-                    for line in content.splitlines():
-                        line = line.strip()
-                        if not line:
-                            continue
-                        if url_pattern.match(line):
-                            full_url = line if line.startswith('http') else 'http://' + line
-                            domain = urlparse(full_url).netloc.lower()
-                            if domain.startswith('www.'):
-                                domain = domain[4:]
-                            if domain:
-                                domains.add(domain)
-                        else:
-                            logger.warning(f"Invalid URL in potential_directories.txt: {line}")
-
-                    universities_file = os.path.join(DATA_DIR, 'universities.txt')
-                    with open(universities_file, 'w', encoding='utf-8') as uni_file:
-                        for domain in sorted(domains):
-                            uni_file.write(domain + '\n')
-            except IOError as e:
-                logger.error(f"Failed to write to {filename}: {str(e)}")
-                return HttpResponseRedirect(request.path)
+        file_path = _EDITABLE_FILES.get(filename)
+        if file_path is None or content is None:
+            return HttpResponseBadRequest('Unknown file')
+        try:
+            file_path.write_bytes(content.encode('utf-8'))
+            
+            if filename == 'potential_directories.txt':
+                domains = {domain for domain in _directory_domains(content.splitlines()) if domain}
+                with open(_EDITABLE_FILES['universities.txt'], 'w', encoding='utf-8', buffering=WRITE_BUFFER_BYTES) as uni_file:
+                    uni_file.writelines(domain + '\n' for domain in sorted(domains))
+        except IOError as e:
+            logger.error(f"Failed to write to {filename}: {str(e)}")
+            return HttpResponseRedirect(request.path)
         return redirect('files')
 
-    file_content = {}
-    for filename in ['universities.txt', 'potential_directories.txt', 'urls.txt']:
-        file_path = os.path.join(DATA_DIR, filename)
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                file_content[filename] = f.read()
-        except FileNotFoundError:
-            file_content[filename] = ''
-            logger.warning(f"File not found: {filename}")
-        except UnicodeDecodeError:
-            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
-                file_content[filename] = f.read()
-            logger.warning(f"{filename} contained undecodable characters, replaced with placeholders")
+    contents = _file_read_executor.map(_read_or_empty, (Path(DATA_DIR) / name for name in DATA_FILES))
+    file_content = dict(zip(DATA_FILES, contents))
     return render(request, 'files.html', {'file_content': file_content})
 
 def database(request):
-    entities = Entity.objects.all()
-    return render(request, 'database.html', {'entities': entities})
+    # Only what the collapsed list shows; entity_detail fills in the rest on expand.
+    entities = Entity.objects.values('id', 'url', 'university').order_by('id')
+    page = Paginator(entities, 100).get_page(request.GET.get('page'))
+    return render(request, 'database.html', {'entities': page, 'page_obj': page})
+
+def entity_detail(request, id):
+    """Render the detail table for one entity, loaded when its database row is expanded."""
+    entity = get_object_or_404(Entity.objects.values('id', 'url', *EDITABLE_FIELDS, 'timestamp'), id=id)
+    return render(request, 'entity_detail.html', {'entity': entity})
 
 def session_output(request, session_id):
     try:
-        session = Session.objects.get(id=session_id)
-        session_entities = session.entities.all()
+        session = Session.objects.prefetch_related('entities').get(id=session_id)
+        session_entities = session.entities.all()  # served from the prefetch cache
         return render(request, 'session_output.html', {
             'session_entities': session_entities,
             'session_id': session_id
@@ -185,134 +289,293 @@ def delete_session_selected(request, session_id):
     if request.method == 'POST':
         ids = request.POST.getlist('ids')
         if not ids:
+            if _wants_json(request):
+                return JsonResponse({'status': 'error', 'message': 'No items selected'}, status=400)
             messages.error(request, 'No items selected')
             return redirect('session_output', session_id=session_id)
         count, _ = Entity.objects.filter(id__in=ids, session_id=session_id).delete()
+        if _wants_json(request):
+            return JsonResponse({'status': 'ok', 'deleted': count})
         messages.success(request, f'Deleted {count} selected items from session {session_id}')
         return redirect('session_output', session_id=session_id)
     messages.error(request, 'Invalid request method')
     return redirect('session_output', session_id=session_id)
 
-@csrf_exempt
+def _wants_json(request):
+    """True when the caller is the page's fetch() code rather than a plain form post."""
+    return (request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+            or 'application/json' in request.headers.get('Accept', ''))
+
+def _validated_json(raw, default):
+    """Parse one JSON textarea from edit_row; blank means default, malformed raises ValueError."""
+    if not raw or not raw.strip():
+        return default
+    return orjson.loads(raw)
+
 def edit_row(request, id):
-    entity = Entity.objects.get(id=id)
     if request.method == 'POST':
-        entity.university = request.POST.get('university', '')
-        entity.location = json.dumps(json.loads(request.POST.get('location', '{}')))
-        entity.website = request.POST.get('website', '')
-        entity.edurank = json.dumps(json.loads(request.POST.get('edurank', '{}')))
-        entity.department = json.dumps(json.loads(request.POST.get('department', '{}')))
-        entity.publications = json.dumps(json.loads(request.POST.get('publications', '{}')))
-        entity.related = request.POST.get('related', '')
-        entity.point_of_contact = json.dumps(json.loads(request.POST.get('point_of_contact', '{}')))
-        entity.scopes = json.dumps(json.loads(request.POST.get('scopes', '[]')))
-        entity.research_abstract = request.POST.get('research_abstract', '')
-        entity.lab_equipment = json.dumps(json.loads(request.POST.get('lab_equipment', '{}')))
-        entity.save()
+        fields = {name: request.POST.get(name, '') for name in STR_FIELDS}
+        for name, default in JSON_FIELDS:
+            try:
+                fields[name] = _validated_json(request.POST.get(name), default())
+            except ValueError as e:
+                if _wants_json(request):
+                    return JsonResponse({'status': 'error', 'field': name, 'message': str(e)}, status=400)
+                messages.error(request, f'Invalid JSON in {name}: {e}')
+                return redirect('edit_row', id=id)
+        with transaction.atomic():
+            updated = Entity.objects.filter(id=id).update(**fields)
+        if not updated:
+            if _wants_json(request):
+                return JsonResponse({'status': 'error', 'message': f'Row {id} not found'}, status=404)
+            raise Http404(f'Entity {id} not found')
+        if _wants_json(request):
+            return JsonResponse({'status': 'ok', 'updated': updated})
         return redirect('database')
+    entity = get_object_or_404(Entity.objects.only('id', *EDITABLE_FIELDS), id=id)
     return render(request, 'edit_row.html', {'entity': entity})
 
-@csrf_exempt
 def delete_row(request, id):
     if request.method == 'POST':
-        Entity.objects.get(id=id).delete()
-        messages.success(request, f'Successfully deleted row {id}')
+        count, _ = Entity.objects.filter(id=id).delete()
+        if _wants_json(request):
+            if not count:
+                return JsonResponse({'status': 'error', 'message': f'Row {id} not found'}, status=404)
+            return JsonResponse({'status': 'ok', 'deleted': count})
+        if count:
+            messages.success(request, f'Successfully deleted row {id}')
+        else:
+            messages.error(request, f'Row {id} not found')
         return redirect('database')  
     messages.error(request, 'Invalid request method')
     return redirect('database')
 
-@csrf_exempt
 def delete_all(request):
     if request.method == 'POST':
-        count, _ = Entity.objects.all().delete()
+        # Entity has no dependent rows or delete signals, so skip the Collector.
+        entities = Entity.objects.all()
+        count = entities._raw_delete(entities.db)
+        if _wants_json(request):
+            return JsonResponse({'status': 'ok', 'deleted': count})
         messages.success(request, f'Deleted all {count} entries')
         return redirect('database')
     messages.error(request, 'POST required')
     return redirect('database')
 
-@csrf_exempt
 def delete_selected(request):
     if request.method == 'POST':
         try:
-            payload = json.loads(request.body)
-            ids = payload.get('ids', [])
-        except (ValueError, TypeError):
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return HttpResponseBadRequest('Invalid Content-Length')
+        if content_length > DELETE_MAX_BODY_BYTES:
+            return HttpResponseBadRequest('Request body too large')
+        if request.content_type == 'application/json':
+            try:
+                ids = orjson.loads(request.body).get('ids', [])
+            except (ValueError, AttributeError):
+                return HttpResponseBadRequest('Invalid JSON payload')
+        else:
             ids = request.POST.getlist('ids')
-        
+
         if not ids:
+            if _wants_json(request):
+                return JsonResponse({'status': 'error', 'message': 'No items selected'}, status=400)
             messages.error(request, 'No items selected')
             return redirect('database')
-        
-        count, _ = Entity.objects.filter(id__in=ids).delete()
+
+        try:
+            if not isinstance(ids, list) or len(ids) > DELETE_MAX_IDS:
+                raise ValueError(ids)
+            ids = [int(x) for x in ids]
+        except (ValueError, TypeError):
+            if _wants_json(request):
+                return JsonResponse({'status': 'error', 'message': 'Invalid item ids'}, status=400)
+            messages.error(request, 'Invalid item ids')
+            return redirect('database')
+
+        count = 0
+        with transaction.atomic():
+            for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                batch = Entity.objects.filter(id__in=ids[start:start + DELETE_BATCH_SIZE])
+                count += batch._raw_delete(batch.db)
+        if _wants_json(request):
+            return JsonResponse({'status': 'ok', 'deleted': count})
         messages.success(request, f'Deleted {count} selected items')
         return redirect('database')
     
     messages.error(request, 'Invalid request method')
     return redirect('database')
 
+def _crawl_worker_loop():
+    while True:
+        session = _crawl_queue.get()
+        _crawl_busy.set()
+        try:
+            run_workflow_with_stop(session)
+        except Exception as e:
+            logger.error(f"Crawler worker failed: {str(e)}")
+        finally:
+            _crawl_busy.clear()
+            connection.close()
+            _crawl_queue.task_done()
+            logger.info(f"Crawler session {session.id} finished")
+
+def _enqueue_crawl(session):
+    """Hand a session to the crawler worker, starting the worker on first use. Call with _start_lock held."""
+    global _crawl_worker
+    if _crawl_worker is None or not _crawl_worker.is_alive():
+        _crawl_worker = threading.Thread(target=_crawl_worker_loop, name='crawler-worker', daemon=True)
+        _crawl_worker.start()
+    _crawl_queue.put(session)
+
 def run_crawler(request):
-    if crawler_running_event.is_set():
-        logger.info("Crawler already running, rejecting new request")
-        return JsonResponse({'status': 'already_running', 'message': 'Crawler is already running'})
-    
-    logger.info("Starting crawler...")
-    session = Session.objects.create()
-    crawler_running_event.set()
-    logger.info("Crawler execution started")
-    
-    global crawler_thread
-    crawler_thread = threading.Thread(target=run_workflow_with_stop, args=(session,), daemon=True)
-    crawler_thread.start()
-    logger.info("Crawler thread started")
+    with _start_lock:
+        if crawler_running_event.is_set():
+            logger.info("Crawler already running, rejecting new request")
+            return JsonResponse({'status': 'already_running', 'message': 'Crawler is already running'})
+        if _crawl_busy.is_set():
+            logger.info("Previous crawler still shutting down, rejecting new request")
+            return JsonResponse({'status': 'already_running', 'message': 'Crawler is still stopping'})
+        if not acquire_crawler_lock():
+            logger.info("Crawler running in another worker, rejecting new request")
+            return JsonResponse({'status': 'already_running', 'message': 'Crawler is already running'})
+        
+        logger.info("Starting crawler...")
+        try:
+            session = Session.objects.create()
+        except Exception:
+            release_crawler_lock()
+            raise
+        set_crawl_session(session.id)
+        crawler_running_event.set()
+        _enqueue_crawl(session)
+        logger.info("Crawler queued")
     
     return JsonResponse({'status': 'started', 'session_id': session.id})
 
 def get_crawler_state(request):
     is_running = crawler_running_event.is_set()
-    return JsonResponse({'is_running': is_running})
+    is_stopping = not is_running and _crawl_busy.is_set()
+    return JsonResponse({'is_running': is_running, 'is_stopping': is_stopping})
 
 def stop_crawler(request):
     logger.info(f"Before stop: crawler_running_event.is_set() = {crawler_running_event.is_set()}")
-    if not crawler_running_event.is_set():
+    # Flag the crawl's session in the database as well, so the stop reaches the
+    # crawl even when it runs in another worker process. Quick scrapes and
+    # stale rows are left alone.
+    session_id = crawl_session()
+    signalled = session_id is not None and Session.objects.filter(id=session_id, status='running').update(status='stopping')
+    if not crawler_running_event.is_set() and not signalled:
         logger.info("No crawler running to stop")
         return JsonResponse({'status': 'not_running', 'message': 'No crawler is running'})
     
     logger.info("Stopping crawler...")
-    crawler_running_event.clear()
+    request_stop()
     logger.info(f"After clear: crawler_running_event.is_set() = {crawler_running_event.is_set()}")
-
-    global crawler_thread
-    if crawler_thread:
-        crawler_thread.join(timeout=5)
-        if crawler_thread.is_alive():
-            logger.warning("Crawler thread did not stop within 5 seconds")
-        crawler_thread = None
-    logger.info("Crawler stopped by user")
-    return JsonResponse({'status': 'stopped'})
+    return JsonResponse({'status': 'stopping'}, status=202)
+
+def _ndjson_lines(lines):
+    """Encode lines as one {"line": ...} object per line."""
+    return b''.join(orjson.dumps({'line': line}) + b'\n' for line in lines)
+
+def _read_log_window(size, offset, tail):
+    """Return (lines, next_offset) for crawler.log from offset, or its last tail lines when offset is unset."""
+    start = max(0, size - LOG_TAIL_BYTES)
+    if 0 <= offset <= size:
+        start = max(start, offset)
+
+    data = b''
+    if size > start:
+        with open(LOG_FILE, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = mm[start:size]  # copies only the requested window
+    if start > 0 and start != offset:
+        cut = data.find(b'\n') + 1  # first line is cut mid-way by the seek
+        data = data[cut:]
+        start += cut
+    end = data.rfind(b'\n') + 1  # leave a half-written last line for the next poll
+    lines = data[:end].decode('utf-8', errors='replace').splitlines(keepends=True)
+    if start != offset:
+        lines = list(deque(lines, maxlen=tail))
+    return lines, start + end
 
 def get_logs(request):
+    """Return crawler.log lines as NDJSON after ?offset= (or ?since=), or the last ?tail= lines when neither is given.
+
+    The window is at most LOG_TAIL_BYTES, so the body is built in one go. The
+    byte offset to poll from next is returned in the X-Log-Offset header.
+    """
     try:
-        with open(LOG_FILE, 'r', encoding='utf-8') as f:
-            logs = f.readlines()
-    except UnicodeDecodeError:
-        with open(LOG_FILE, 'r', encoding='utf-8', errors='replace') as f:
-            logs = f.readlines()
-            logger.warning("crawler.log contained non-UTF-8 characters; replaced with placeholders")
+        st = os.stat(LOG_FILE)
     except FileNotFoundError:
-        logs = ['No logs available yet.']
-    return JsonResponse({'logs': logs})
+        response = HttpResponse(_ndjson_lines(['No logs available yet.']), content_type='application/x-ndjson')
+        response['X-Log-Offset'] = '0'
+        return response
 
+    etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponseNotModified(headers={'ETag': etag})
 
-def run_workflow_with_stop(session, quick_scrape=False, initial_url=None):
-    """Execute workflow with stop control."""
     try:
+        offset = int(request.GET.get('since', request.GET.get('offset', -1)))
+    except ValueError:
+        offset = -1
+    try:
+        tail = max(1, int(request.GET.get('tail', LOG_TAIL_LINES)))
+    except ValueError:
+        tail = LOG_TAIL_LINES
+
+    # Several tabs polling an unchanged log share the last answer.
+    key = (st.st_mtime_ns, st.st_size, offset, tail)
+    cached = _LOG_CACHE.get('entry')
+    if cached and cached[0] == key:
+        _, body, next_offset = cached
+    else:
+        logs, next_offset = _read_log_window(st.st_size, offset, tail)
+        body = _ndjson_lines(logs)
+        _LOG_CACHE['entry'] = (key, body, next_offset)
+
+    response = HttpResponse(body, content_type='application/x-ndjson')
+    response['X-Log-Offset'] = str(next_offset)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _watch_for_stop(session_id, done):
+    """Clear crawler_running_event once the session is marked 'stopping' in the database."""
+    try:
+        while not done.wait(STOP_POLL_SECONDS):
+            if Session.objects.filter(id=session_id, status='stopping').exists():
+                logger.info(f"Stop requested for session {session_id}")
+                request_stop()
+                return
+    finally:
+        connection.close()
+
+def run_workflow_with_stop(session, quick_scrape=False, initial_url=None, run_event=None):
+    """Execute workflow with stop control; run_event defaults to crawler_running_event."""
+    run_event = run_event or crawler_running_event
+    done = threading.Event()
+    if not quick_scrape:
+        threading.Thread(target=_watch_for_stop, args=(session.id, done), daemon=True).start()
+    try:
+        if not quick_scrape:
+            prime_url_cache()
+            clear_host_cache()
         logger.info(f"Starting run_workflow_with_stop (quick_scrape={quick_scrape}, initial_url={initial_url})")
-        run_workflow(session, quick_scrape=quick_scrape, initial_url=initial_url)
+        run_workflow(session, quick_scrape=quick_scrape, initial_url=initial_url, run_event=run_event)
     finally:
+        done.set()
+        status = 'completed' if run_event.is_set() else 'stopped'
+        Session.objects.filter(id=session.id).update(status=status, end_time=timezone.now())
         if not quick_scrape:
             logger.info("Cleaning up: Clearing crawler_running_event")
             crawler_running_event.clear()
-        logger.info("Crawler execution completed or stopped")
+            clear_url_cache()
+            set_crawl_session(None)
+            release_crawler_lock()
+        logger.info(f"Crawler execution {status}")
 
 
 async def handle_streaming(quick_data):
@@ -320,11 +583,55 @@ async def handle_streaming(quick_data):
     logger.info(f"Streaming {len(quick_data)} quick scrape results")
     if quick_data:
         for data in quick_data:
-            yield f"data: {json.dumps({'status': 'quick_data', 'data': data, 'full_crawl_ongoing': True})}\n\n"
+            yield b"data: " + orjson.dumps({'status': 'quick_data', 'data': data, 'full_crawl_ongoing': True}) + b"\n\n"
     else:
-        yield f"data: {json.dumps({'status': 'quick_data', 'message': 'No quick data available', 'full_crawl_ongoing': True})}\n\n"
-    yield f"data: {json.dumps({'status': 'complete', 'message': 'Quick scrape completed', 'full_crawl_ongoing': True})}\n\n"
+        yield _SSE_NO_QUICK_DATA
+    yield _SSE_QUICK_COMPLETE
+
 
+def _parse_university(prompt):
+    """Ask Groq which university the prompt is about; returns the normalized name or None."""
+    client = Groq(api_key=GROQ_API_KEY)
+    parse_prompt = f"""
+    Extract the university name from the following prompt. Return a JSON object with a 'university' field.
+    If no university is mentioned, set 'university' to null.
+    Prompt: {prompt}
+    Example: {{"university": "Kwame Nkrumah University of Science and Technology"}}
+    """
+    chat_completion = client.chat.completions.create(
+        messages=[{"role": "user", "content": parse_prompt}],
+        model="llama3-70b-8192"
+    )
+    completion_text = chat_completion.choices[0].message.content
+    logger.debug(f"Raw Groq API response: {completion_text}")
+
+    try:
+        prompt_info = json.loads(completion_text)
+        university = prompt_info.get('university')
+    except json.JSONDecodeError:
+        json_matches = _JSON_BLOCK_RE.findall(completion_text)
+        if not json_matches:
+            raise ValueError("No valid JSON object found in response")
+        for json_str in json_matches:
+            try:
+                prompt_info = json.loads(json_str)
+                university = prompt_info.get('university')
+                break
+            except json.JSONDecodeError:
+                continue
+        else:
+            raise ValueError("No valid JSON object could be parsed")
+
+    if not university:
+        return None
+
+    normalized_university = _UNI_MAP.get(university.casefold(), university)
+    logger.info(f"Identified university: {university} (normalized: {normalized_university})")
+    return normalized_university
+
+def _search_text(query, max_results):
+    """Run a DuckDuckGo text search on this thread's client."""
+    return _ddgs().text(query, max_results=max_results)
 
 
 @csrf_exempt
@@ -343,96 +650,48 @@ async def ai_prompt(request):
 
     logger.info(f"Processing AI prompt: {prompt}")
 
-    # Step 1: Parse prompt to extract university name using Groq AI
-    client = Groq(api_key=GROQ_API_KEY)
-    parse_prompt = f"""
-    Extract the university name from the following prompt. Return a JSON object with a 'university' field.
-    If no university is mentioned, set 'university' to null.
-    Prompt: {prompt}
-    Example: {{"university": "Kwame Nkrumah University of Science and Technology"}}
-    """
-    try:
-        chat_completion = client.chat.completions.create(
-            messages=[{"role": "user", "content": parse_prompt}],
-            model="llama3-70b-8192"
-        )
-        completion_text = chat_completion.choices[0].message.content
-        logger.debug(f"Raw Groq API response: {completion_text}")
-
-        try:
-            prompt_info = json.loads(completion_text)
-            university = prompt_info.get('university')
-        except json.JSONDecodeError:
-            json_matches = re.findall(r'\{.*?\}', completion_text, re.DOTALL)
-            if not json_matches:
-                raise ValueError("No valid JSON object found in response")
-            for json_str in json_matches:
-                try:
-                    prompt_info = json.loads(json_str)
-                    university = prompt_info.get('university')
-                    break
-                except json.JSONDecodeError:
-                    continue
-            else:
-                raise ValueError("No valid JSON object could be parsed")
-
-        if not university:
-            logger.error("No university identified in prompt")
-            return JsonResponse({'error': 'No university identified in prompt'}, status=400)
-
-        university_map = {
-            "university of knust": "Kwame Nkrumah University of Science and Technology",
-            "knust": "Kwame Nkrumah University of Science and Technology",
-            "university of ghana": "University of Ghana",
-            "legon": "University of Ghana",
-            "university of development studies": "University for Development Studies",
-            "uds": "University for Development Studies"
-        }
-        normalized_university = university_map.get(university.lower(), university)
-        logger.info(f"Identified university: {university} (normalized: {normalized_university})")
-        university = normalized_university
-    except Exception as e:
-        logger.error(f"Groq API error parsing prompt: {str(e)}")
-        return JsonResponse({'error': f'Failed to parse prompt: {str(e)}'}, status=500)
+    # Step 1: Parse the university name with Groq while the DuckDuckGo search
+    # for the prompt (needed in step 3 unless the database answers) runs alongside.
+    parsed, prompt_results = await asyncio.gather(
+        asyncio.to_thread(_parse_university, prompt),
+        asyncio.to_thread(_search_text, prompt, 3),
+        return_exceptions=True,
+    )
+    if isinstance(parsed, Exception):
+        logger.error(f"Groq API error parsing prompt: {str(parsed)}")
+        return JsonResponse({'error': f'Failed to parse prompt: {str(parsed)}'}, status=500)
+    university = parsed
+    if not university:
+        logger.error("No university identified in prompt")
+        return JsonResponse({'error': 'No university identified in prompt'}, status=400)
 
     # Step 2: Check database for relevant information
-    keywords = [kw for kw in prompt.lower().split() if kw not in university.lower().split()]
-    query = Q(university__icontains=university)
-    for keyword in keywords:
-        query &= (Q(department__icontains=keyword) | Q(research_abstract__icontains=keyword))
-
-    async def get_entities():
-        return await sync_to_async(list)(Entity.objects.filter(query).distinct())
-
-    entities = await get_entities()
-    if entities and all(entity.university.lower().find(university.lower()) != -1 for entity in entities):
-        logger.info(f"Found {len(entities)} relevant entities for {university}")
-        response_data = [
-            {
-                'university': entity.university,
-                'location': json.loads(entity.location),
-                'website': entity.website,
-                'edurank': json.loads(entity.edurank),
-                'department': json.loads(entity.department),
-                'publications': json.loads(entity.publications),
-                'scopes': json.loads(entity.scopes),
-                'research_abstract': entity.research_abstract
-            } for entity in entities[:5]
-        ]
+    university_tokens = set(_TOKEN_SPLIT_RE.split(university.lower()))
+    keywords = {kw for kw in _TOKEN_SPLIT_RE.split(prompt.lower()) if kw and kw not in university_tokens}
+    query = Q(university__icontains=university) & reduce(
+        operator.or_,
+        (Q(department__icontains=kw) | Q(research_abstract__icontains=kw) for kw in keywords),
+        Q(),
+    )
+
+    # university__icontains already guarantees every row matches, so only
+    # the five rows we return are fetched.
+    response_data = await sync_to_async(list)(Entity.objects.filter(query).values(*PROMPT_RESULT_FIELDS).distinct()[:5])
+    if response_data:
+        logger.info(f"Found {len(response_data)} relevant entities for {university}")
         return JsonResponse({'status': 'success', 'data': response_data, 'full_crawl_ongoing': False})
 
     # Step 3: Search for specific URL using the full prompt
     logger.info(f"No relevant data for {university}, searching for URL with prompt: {prompt}")
-    search_query = prompt
     try:
-        with DDGS() as ddgs:
-            results = ddgs.text(search_query, max_results=3)
+        if isinstance(prompt_results, Exception):
+            raise prompt_results
+        results = prompt_results
         if not results:
             logger.warning(f"No URL found for prompt: {prompt}")
             fallback_query = f"{university} official website"
             logger.info(f"Falling back to search: {fallback_query}")
-            with DDGS() as ddgs:
-                results = ddgs.text(fallback_query, max_results=1)
+            results = await asyncio.to_thread(_search_text, fallback_query, 1)
             if not results:
                 logger.error(f"No URL found for {university}")
                 return JsonResponse({'error': f'No URL found for {university}'}, status=404)
@@ -441,9 +700,7 @@ async def ai_prompt(request):
         full_url = None
         for result in results:
             url = result['href']
-            domain = urlparse(url).netloc.lower()
-            if domain.startswith('www.'):
-                domain = domain[4:]
+            domain = extract_domain(url)
             if university_domain in domain or domain.endswith('.edu.gh'):
                 full_url = url
                 break
@@ -452,21 +709,17 @@ async def ai_prompt(request):
             logger.error(f"No URL from {university} domain found in results")
             return JsonResponse({'error': f'No relevant URL found for {university}'}, status=404)
 
-        domain = urlparse(full_url).netloc.lower()
-        if domain.startswith('www.'):
-            domain = domain[4:]
+        domain = extract_domain(full_url)
         logger.info(f"Selected URL: {full_url}, domain: {domain}")
     except Exception as e:
         logger.error(f"DuckDuckGo search failed: {str(e)}")
         return JsonResponse({'error': f'Search failed: {str(e)}'}, status=500)
 
     # Save to files
-    universities_file = os.path.join(DATA_DIR, 'universities.txt')
-    directories_file = os.path.join(DATA_DIR, 'potential_directories.txt')
     try:
-        with open(universities_file, 'a') as uni_file:
+        with open(_EDITABLE_FILES['universities.txt'], 'a', encoding='utf-8', buffering=WRITE_BUFFER_BYTES) as uni_file:
             uni_file.write(domain + '\n')
-        with open(directories_file, 'a') as dir_file:
+        with open(_EDITABLE_FILES['potential_directories.txt'], 'a', encoding='utf-8', buffering=WRITE_BUFFER_BYTES) as dir_file:
             dir_file.write(full_url + '\n')
     except IOError as e:
         logger.error(f"Failed to save to files: {str(e)}")
@@ -475,50 +728,46 @@ async def ai_prompt(request):
     # Step 4: Perform quick scrape of the DuckDuckGo URL
     logger.info(f"Performing quick scrape for URL: {full_url}")
     quick_session = await sync_to_async(Session.objects.create)()
-    crawler_running_event.set()
+    # The quick scrape runs on an event of its own: setting or clearing the
+    # global one would block new crawls or stop one already running.
+    quick_event = threading.Event()
+    quick_event.set()
     logger.info(f"Quick scrape started, session ID: {quick_session.id}")
-    await sync_to_async(run_workflow_with_stop)(quick_session, quick_scrape=True, initial_url=full_url)
-    await asyncio.sleep(1)  # Ensure database commits
+    # Run on a worker thread of its own: sync_to_async's default
+    # thread-sensitive mode would hold the shared sync thread (and with it
+    # every other sync view) for the whole scrape. run_workflow flushes the
+    # buffered entities before returning, so the rows are committed here.
+    await asyncio.to_thread(run_workflow_with_stop, quick_session, quick_scrape=True, initial_url=full_url, run_event=quick_event)
     logger.info("Quick scrape completed")
-    crawler_running_event.clear()
-    logger.info(f"After quick scrape: crawler_running_event.is_set() = {crawler_running_event.is_set()}")
 
     # Step 5: Check database for quick scrape results
-    async def get_quick_entities():
-        return await sync_to_async(list)(Entity.objects.filter(session_id=quick_session.id))
-
-    quick_entities = await get_quick_entities()
-    quick_data = [
-        {
-            'university': entity.university,
-            'location': json.loads(entity.location),
-            'website': entity.website,
-            'edurank': json.loads(entity.edurank),
-            'department': json.loads(entity.department),
-            'publications': json.loads(entity.publications),
-            'scopes': json.loads(entity.scopes),
-            'research_abstract': entity.research_abstract
-        } for entity in quick_entities
-    ]
-    logger.info(f"Retrieved {len(quick_entities)} quick scrape entities for session {quick_session.id}")
+    quick_data = await sync_to_async(list)(
+        Entity.objects.filter(session_id=quick_session.id).values(*PROMPT_RESULT_FIELDS)
+    )
+    logger.info(f"Retrieved {len(quick_data)} quick scrape entities for session {quick_session.id}")
 
     # Step 6: Start full crawler in background (outside response)
     def start_full_crawler():
-        if crawler_running_event.is_set():
-            logger.info("Crawler already running, skipping new full crawl")
-            return
-        logger.info(f"Starting full crawler for {university}")
-        full_session = Session.objects.create()
-        crawler_running_event.set()
-        try:
-            run_workflow_with_stop(full_session, quick_scrape=False, initial_url=None)
-        except Exception as e:
-            logger.error(f"Full crawler failed: {str(e)}")
-        finally:
-            crawler_running_event.clear()
-            logger.info(f"Full crawler session {full_session.id} completed")
+        with _start_lock:
+            if crawler_running_event.is_set() or _crawl_busy.is_set():
+                logger.info("Crawler already running, skipping new full crawl")
+                return
+            if not acquire_crawler_lock():
+                logger.info("Crawler running in another worker, skipping new full crawl")
+                return
+            logger.info(f"Starting full crawler for {university}")
+            try:
+                full_session = Session.objects.create()
+            except Exception:
+                release_crawler_lock()
+                raise
+            crawler_running_event.set()
+            _enqueue_crawl(full_session)
 
-    threading.Thread(target=start_full_crawler, daemon=True).start()
+    try:
+        await sync_to_async(start_full_crawler)()
+    except Exception as e:
+        logger.error(f"Full crawler failed to start: {str(e)}")
 
     # Step 7: Handle response based on client capabilities
     accept_header = request.headers.get('Accept', '')
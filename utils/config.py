@@ -1,23 +1,37 @@
 import os
-import json
+import orjson
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'data/config.json')
+
+# (st_mtime_ns, parsed config) of the last read; callers treat the dict as read-only.
+_cfg_cache = (None, None)
 
 def load_config():
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'data/config.json')
-    if not os.path.exists(config_path):
-        raise FileNotFoundError(f"Config file not found at {config_path}")
-    
-    with open(config_path, 'r') as f:
+    global _cfg_cache
+    config_path = CONFIG_PATH
+    try:
+        mtime = os.stat(config_path).st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Config file not found at {config_path}") from None
+    if _cfg_cache[0] == mtime:
+        return _cfg_cache[1]
+
+    with open(config_path, 'rb') as f:
         try:
-            return json.load(f)
-        except json.JSONDecodeError as e:
+            config = orjson.loads(f.read())
+        except orjson.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON in config file: {e}")
+    _cfg_cache = (mtime, config)
+    return config
 
 def save_config(config):
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'data/config.json')
-    
+    global _cfg_cache
+    config_path = CONFIG_PATH
+
     try:
-        with open(config_path, 'w') as f:
-            json.dump(config, f, indent=4)  
+        data = orjson.dumps(config, option=orjson.OPT_INDENT_2)
+        with open(config_path, 'wb') as f:
+            f.write(data)
     except TypeError as e:
         raise ValueError(f"Config contains non-serializable data: {e}")
     except FileNotFoundError:
@@ -25,4 +39,5 @@ def save_config(config):
     except PermissionError:
         raise PermissionError(f"Permission denied when writing to config file at: {config_path}")
     except Exception as e:
-        raise RuntimeError(f"Unexpected error while saving config: {e}")
\ No newline at end of file
+        raise RuntimeError(f"Unexpected error while saving config: {e}")
+    _cfg_cache = (os.stat(config_path).st_mtime_ns, config)
\ No newline at end of file
@@ -1,7 +1,24 @@
-import json
+import threading
 from crawler.models import Entity
 from django.db import transaction
 
+BULK_BATCH_SIZE = 500
+ENTITY_FIELDS = [
+    'university', 'location', 'website', 'edurank', 'department', 'publications',
+    'related', 'point_of_contact', 'scopes', 'research_abstract', 'lab_equipment',
+]
+# Fields not listed here default to an empty dict
+_FIELD_DEFAULTS = {'university': '', 'website': '', 'related': '', 'research_abstract': '', 'scopes': []}
+
+# Scraped entities waiting to be written, keyed by URL so a page seen twice
+# in one batch becomes a single upsert row.
+_pending_entities = {}
+_pending_lock = threading.Lock()
+
+# URLs known to be stored, seeded once per crawl by prime_url_cache so
+# url_exists_in_db can answer from memory; None means "ask the database".
+_url_cache = None
+
 def create_db():
     """Initialize the database (handled by Django migrations)."""
     print("Initializing database...")
@@ -18,58 +35,80 @@ def store_data(url, extracted_data, session=None):
             print(f"Skipping storage for {url}: All fields are empty")
             return
         
-        with transaction.atomic():
-            try:
-                entity = Entity.objects.filter(url=url).first()
-                created = entity is None
-                if created:
-                    entity = Entity(url=url, session=session)
-                
-                # Prepare data for comparison
-                existing_dict = {
-                    'university': entity.university or '',
-                    'location': entity.get_json_field('location') if entity.location else {},
-                    'website': entity.website or '',
-                    'edurank': entity.get_json_field('edurank') if entity.edurank else {},
-                    'department': entity.get_json_field('department') if entity.department else {},
-                    'publications': entity.get_json_field('publications') if entity.publications else {},
-                    'related': entity.related or '',
-                    'point_of_contact': entity.get_json_field('point_of_contact') if entity.point_of_contact else {},
-                    'scopes': entity.get_json_field('scopes') if entity.scopes else [],
-                    'research_abstract': entity.research_abstract or '',
-                    'lab_equipment': entity.get_json_field('lab_equipment') if entity.lab_equipment else {}
-                }
-
-                # Compare with extracted data
-                if existing_dict == extracted_data:
-                    print(f"Skipping storage for {url}: Data is identical to existing")
-                    return
-                
-                # Update entity
-                entity.university = extracted_data.get('university', '')
-                entity.set_json_field('location', extracted_data.get('location', {}))
-                entity.website = extracted_data.get('website', '')
-                entity.set_json_field('edurank', extracted_data.get('edurank', {}))
-                entity.set_json_field('department', extracted_data.get('department', {}))
-                entity.set_json_field('publications', extracted_data.get('publications', {}))
-                entity.related = extracted_data.get('related', '')
-                entity.set_json_field('point_of_contact', extracted_data.get('point_of_contact', {}))
-                entity.set_json_field('scopes', extracted_data.get('scopes', []))
-                entity.research_abstract = extracted_data.get('research_abstract', '')
-                entity.set_json_field('lab_equipment', extracted_data.get('lab_equipment', {}))
-                entity.session = session or entity.session  # Preserve existing session if None
-                entity.save()
-                
-                action = "Inserted" if created else "Updated"
-                print(f"{action} data for {url}")
-
-            except Exception as e:
-                print(f"Error storing data for {url}: {str(e)}")
+        payload = {field: extracted_data.get(field, _FIELD_DEFAULTS.get(field, {})) for field in ENTITY_FIELDS}
+        if session is not None:
+            payload['session'] = session  # Preserve existing session if None
+        try:
+            _, created = Entity.objects.update_or_create(url=url, defaults=payload)
+            if _url_cache is not None:
+                _url_cache.add(url)
+            action = "Inserted" if created else "Updated"
+            print(f"{action} data for {url}")
+        except Exception as e:
+            print(f"Error storing data for {url}: {str(e)}")
     else:
         print(f"No data stored for {url}: {extracted_data.get('error', 'Unknown error')}")
 
+def buffer_entity(url, extracted_data, session=None):
+    """Queue scraped data for the next bulk upsert, flushing once BULK_BATCH_SIZE rows are pending."""
+    if not extracted_data or "error" in extracted_data:
+        print(f"No data stored for {url}: {(extracted_data or {}).get('error', 'Unknown error')}")
+        return
+    if all(value == "" or value == {} or value == [] or value is None for value in extracted_data.values()):
+        print(f"Skipping storage for {url}: All fields are empty")
+        return
+
+    entity = Entity(url=url, session=session)
+    for field in ENTITY_FIELDS:
+        setattr(entity, field, extracted_data.get(field, _FIELD_DEFAULTS.get(field, {})))
+    with _pending_lock:
+        _pending_entities[url] = entity
+        full = len(_pending_entities) >= BULK_BATCH_SIZE
+    if full:
+        flush_entities()
+
+def flush_entities():
+    """Write all buffered entities in one INSERT ... ON CONFLICT(url) DO UPDATE per batch."""
+    with _pending_lock:
+        batch = list(_pending_entities.values())
+        _pending_entities.clear()
+    if not batch:
+        return 0
+    # Like store_data, an entity without a session keeps the stored row's session
+    with_session = [entity for entity in batch if entity.session_id is not None]
+    without_session = [entity for entity in batch if entity.session_id is None]
+    with transaction.atomic():
+        for entities, update_fields in ((with_session, ENTITY_FIELDS + ['session']), (without_session, ENTITY_FIELDS)):
+            if entities:
+                Entity.objects.bulk_create(
+                    entities,
+                    batch_size=BULK_BATCH_SIZE,
+                    update_conflicts=True,
+                    update_fields=update_fields,
+                    unique_fields=['url'],
+                )
+    if _url_cache is not None:
+        _url_cache.update(entity.url for entity in batch)
+    print(f"Stored {len(batch)} entities")
+    return len(batch)
+
+def prime_url_cache():
+    """Load every stored URL into memory for the duration of a crawl."""
+    global _url_cache
+    _url_cache = set(Entity.objects.values_list('url', flat=True))
+    print(f"URL cache primed with {len(_url_cache)} entries")
+
+def clear_url_cache():
+    """Drop the in-memory URL set so lookups go back to the database."""
+    global _url_cache
+    _url_cache = None
+
 def url_exists_in_db(url: str) -> bool:
-    """Check if a URL already exists in the database."""
+    """Check if a URL already exists in the database or is waiting to be written."""
+    if url in _pending_entities:
+        return True
+    if _url_cache is not None:
+        return url in _url_cache
     try:
         return Entity.objects.filter(url=url).exists()
     except Exception as e:
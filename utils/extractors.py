@@ -1,9 +1,16 @@
 import os
+import asyncio
+import contextlib
+import hashlib
 import logging
-import json
+import orjson
+import sqlite3
+import threading
+import time
+import jinja2
 from dotenv import load_dotenv
 from google import genai
-from groq import Groq
+from groq import AsyncGroq, RateLimitError
 
 # Load environment variables
 load_dotenv()
@@ -15,20 +22,100 @@ logger = logging.getLogger(__name__)
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
-def extract_info_with_llm(data: dict):
-    """Use Groq API as primary and Google Gemini as backup to extract structured data."""
-    print("Extracting information with LLM...")
+# Extraction prompt, parsed once; only the three page inputs vary per call
+PROMPT_FILE = os.path.join(os.path.dirname(__file__), 'prompts', 'extractor.j2')
+with open(PROMPT_FILE, encoding='utf-8') as _f:
+    PROMPT_TEMPLATE = jinja2.Environment(autoescape=False, keep_trailing_newline=True).from_string(_f.read())
 
-    if not GROQ_API_KEY:
-        print("Error: GROQ_API_KEY is not set")
-        return {"error": "GROQ_API_KEY is not set"}
-    if not GOOGLE_API_KEY:
-        print("Warning: GOOGLE_API_KEY is not set; Google Gemini backup will not work")
+# Character budgets for page content in the prompt. llama3-70b-8192 has an
+# 8k-token context and the template itself takes ~2k, so at ~4 chars/token the
+# page text is capped at ~4k tokens and the OCR text at ~1k.
+RAW_CONTENT_MAX_CHARS = 16000
+OCR_CONTENT_MAX_CHARS = 4000
+
+# Concurrent calls per provider, and how long one call may take. The slots are
+# process-wide so the cap holds across batches running on different threads
+# and event loops. Gemini has its own slots so fallbacks run alongside Groq
+# instead of queueing behind it.
+GROQ_MAX_CONCURRENCY = 4
+GEMINI_MAX_CONCURRENCY = 2
+LLM_TIMEOUT_SECONDS = 120
+_GROQ_SLOTS = threading.BoundedSemaphore(GROQ_MAX_CONCURRENCY)
+_GEMINI_SLOTS = threading.BoundedSemaphore(GEMINI_MAX_CONCURRENCY)
+
+# After a Groq 429, send prompts straight to Gemini until Groq's retry-after
+# (or this default) has passed
+GROQ_RATE_LIMIT_COOLDOWN_SECONDS = 30
+_groq_paused_until = 0.0
+
+# Successful extractions keyed by a hash of the full prompt, so a page whose
+# content (or the prompt template) changes is extracted again.
+LLM_CACHE_FILE = os.path.join(os.path.dirname(__file__), '..', 'data', 'llm_cache.sqlite3')
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+_cache_lock = threading.Lock()
+_cache_conn = None
+
+def _cache_db():
+    global _cache_conn
+    if _cache_conn is None:
+        _cache_conn = sqlite3.connect(LLM_CACHE_FILE, check_same_thread=False)
+        _cache_conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+        )
+    return _cache_conn
+
+def _cache_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+def _cache_get(key: str):
+    """Return the cached extraction for key, or None if missing or expired."""
+    try:
+        with _cache_lock:
+            row = _cache_db().execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND created > ?",
+                (key, time.time() - LLM_CACHE_TTL_SECONDS),
+            ).fetchone()
+        return orjson.loads(row[0]) if row else None
+    except (sqlite3.Error, ValueError) as e:
+        logger.warning(f"LLM cache read failed: {e}")
+        return None
+
+def _cache_set(key: str, extracted_data: dict):
+    try:
+        with _cache_lock:
+            conn = _cache_db()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created) VALUES (?, ?, ?)",
+                    (key, orjson.dumps(extracted_data).decode(), time.time()),
+                )
+    except (sqlite3.Error, TypeError) as e:
+        logger.warning(f"LLM cache write failed: {e}")
+
+def _truncate_for_llm(text: str, max_chars: int) -> str:
+    """Cut text to at most max_chars, at the last word boundary when there is one."""
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(' ', 0, max_chars)
+    return text[:cut if cut > 0 else max_chars]
 
+def _truncate_ocr(ocr_content: list, max_chars: int) -> list:
+    """Keep OCR items in order until their combined text reaches max_chars."""
+    kept = []
+    for item in ocr_content:
+        if max_chars <= 0:
+            break
+        text = _truncate_for_llm(item.get('text', ''), max_chars)
+        max_chars -= len(text)
+        kept.append({**item, 'text': text})
+    return kept
+
+def _build_prompt(data: dict) -> str:
+    """Assemble the extraction prompt for one scraped page."""
     # Prepare pre-extracted and raw content for the prompt
     pre_extracted = ""
     for key, value in data.items():
-        if key != 'raw_content':
+        if key not in ('raw_content', 'ocr_content'):
             if isinstance(value, dict):
                 value_str = ', '.join([f"{k}: {v}" for k, v in value.items() if v])
                 pre_extracted += f"- {key}: {value_str}\n"
@@ -37,210 +124,145 @@ def extract_info_with_llm(data: dict):
             else:
                 pre_extracted += f"- {key}: {value}\n"
 
-    raw_content = data.get('raw_content', '')
-    ocr_content = data.get('ocr_content', [])
+    raw_content = _truncate_for_llm(data.get('raw_content', ''), RAW_CONTENT_MAX_CHARS)
+    ocr_content = _truncate_ocr(data.get('ocr_content', []), OCR_CONTENT_MAX_CHARS)
 
     logger.info(f"Pre-extracted content: {pre_extracted}")
     logger.info(f"Raw content: {raw_content}")
     logger.info(f"OCR content: {ocr_content}")
-    
-
-    prompt = f"""
-**TOP PRIORITY**:  
-If **neither** the pre‑extracted data nor the raw content clearly pertains to a science or engineering university research lab, its research activities, or a relevant startup—especially one matching UNLOKINNO’s focus on Global South\
-climate‑tech labs or green‑tech startups—you **must** return a JSON object with **all fields blank or empty**. This preserves data integrity and prevents irrelevant entries.
-
-You are an expert data extractor. You are given three inputs for a single webpage:  
-1. **`pre_extracted`** — data already pulled by upstream processes  
-2. **`raw_content`** — the full HTML/text of the page 
-3. **`ocr_content`** — content from images on the webpage 
-
-Your output must be **one** JSON object that **exactly** follows the schema below.
-
-### Task:
-Create a JSON object with the following fields:
-- **"university"**: Use the pre-extracted value if it identifies a university; otherwise, infer from raw content if a university is mentioned (e.g., "at MIT" or "University of X") or strongly implied (e.g., "MIT research" suggests MIT).
-- **"location"**: Object with "country" and "city". Use pre-extracted values if available; otherwise, infer from raw content (e.g., "located in New York, USA") or deduce from the university (e.g., MIT → Cambridge, USA).
-- **"website"**: Use the pre-extracted URL; if missing, infer a likely main website from raw content (e.g., URLs ending in .edu or .org) or deduce from the university (e.g., MIT → "mit.edu").
-- **"edurank"**: Object with "url" (EduRank URL) and "score". Fill if EduRank is mentioned; otherwise, leave empty unless context strongly suggests a ranking source.
-- **"department"**: Object with "name", "url", "teams" (object with "urls" and "members" arrays), and "focus". Use pre-extracted values or infer from raw content if a department, teams, or focus area (e.g., "AI Lab" or "machine learning") is suggested.
-- **"publications"**: Object with "google_scholar_url", "other_url", and "contents" (array of publication details). Use pre-extracted values or extract from raw content if URLs or publication titles are present or implied.
-- **"related"**: Include related entities (e.g., collaborating institutions) if mentioned or reasonably inferred from context.
-- **"point_of_contact"**: Object with "name", "first_name", "last_name", "title", "bio_url", "linked_in", "google_scholar_url", "email", and "phone_number". Use pre-extracted values or infer from raw content if a person’s details (e.g., "Dr. John Doe, jdoe@university.edu") are present or suggested.
-- **"scopes"**: Array of research scopes (e.g., "AI", "robotics"). Use pre-extracted values or identify from raw content based on mentioned or implied research areas.
-- **"research_abstract"**: Provide a concise summary (5-6 sentences) of research activities based on raw content, even if briefly mentioned, or infer from context if research is implied.
-- **"lab_equipment"**: Object with "overview" (short description) and "list" (array of equipment). List equipment mentioned in raw content (e.g., "microscopes") or infer plausible equipment based on research context (e.g., "AI research" might suggest "computing clusters").
-
-### Instructions:
-1. **Strict Schema**: Output must be valid JSON matching the exact field names and types—no extra or missing fields.  
-2. **UNLOKINNO Focus**: Only labs in the offering climatetech/new‑materials services or green‑tech startups. Discard generic or unrelated pages.  
-3. **Evidence‑Based**: Fill a field **only** when there is explicit evidence in `pre_extracted` or `raw_content`. Otherwise set to `""`, `null`, `[]`, or `{{}}`.  
-4. **Minimal Inference**: Infer missing values **only** when context is strong (e.g. a known university’s location). Do **not** fabricate details.  
-5. **Precedence**: Always prefer `pre_extracted` data for accuracy; supplement from `raw_content` only as needed.  
-6. **Single Object**: Return exactly one JSON object per page—never arrays or multiple objects.
-
-### Schema (all fields must be present, with correct types):
-{{
-    "id": 0,  
-    "university": "",
-    "location": {{
-        "country": "",
-        "city": ""
-    }},
-    "website": "",
-    "edurank": {{
-        "url": "",
-        "score": ""
-    }},
-    "department": {{
-        "name": "",
-        "url": "",
-        "teams": {{
-            "urls": [],
-            "members": []
-        }},
-        "focus": ""
-    }},
-    "publications": {{
-        "google_scholar_url": "",
-        "other_url": "",
-        "contents": []
-    }},
-    "related": "",
-    "point_of_contact": {{
-        "name": "",
-        "first_name": "",
-        "last_name": "",
-        "title": "",
-        "bio_url": "",
-        "linked_in": "",
-        "google_scholar_url": "",
-        "email": "",
-        "phone_number": ""
-    }},
-    "scopes": [],
-    "research_abstract": "",
-    "lab_equipment": {{
-        "overview": "",
-        "list": []
-    }}
-}}
-
-### Detailed Example:
-Below is an example output if the webpage were clearly about Stanford University's Robotics Department. Use this strictly as a format reference ONLY; do not infer extra details.
-{{
-    "id": 1,
-    "university": "Stanford University",
-    "location": {{
-        "country": "USA",
-        "city": "Stanford"
-    }},
-    "website": "https://www.stanford.edu",
-    "edurank": {{
-        "url": "https://www.edurank.org/institution/stanford-university",
-        "score": "98.5"
-    }},
-    "department": {{
-        "name": "Robotics Department",
-        "url": "https://robotics.stanford.edu",
-        "teams": {{
-            "urls": ["https://robotics.stanford.edu/team1", "https://robotics.stanford.edu/team2"],
-            "members": ["Dr. Alice Smith", "Dr. Bob Johnson"]
-        }},
-        "focus": "Autonomous systems and machine learning in robotics"
-    }},
-    "publications": {{
-        "google_scholar_url": "https://scholar.google.com/citations?user=abcdefg",
-        "other_url": "https://www.stanford.edu/research/publications",
-        "contents": ["Paper on autonomous navigation", "Research on robot perception"]
-    }},
-    "related": "Collaborations with MIT and Carnegie Mellon University",
-    "point_of_contact": {{
-        "name": "Dr. Emily Davis",
-        "first_name": "Emily",
-        "last_name": "Davis",
-        "title": "Head of Robotics Department",
-        "bio_url": "https://robotics.stanford.edu/emily-davis",
-        "linked_in": "https://www.linkedin.com/in/emilydavis",
-        "google_scholar_url": "https://scholar.google.com/citations?user=hijklmn",
-        "email": "emily.davis@stanford.edu",
-        "phone_number": "+1-650-555-1234"
-    }},
-    "scopes": ["Robotics", "Autonomous Systems", "Machine Learning"],
-    "research_abstract": "The Robotics Department at Stanford University leads research in autonomous systems and robotics.",
-    "lab_equipment": {{
-        "overview": "Equipped with advanced robotics labs including autonomous vehicles and simulation systems.",
-        "list": ["Autonomous vehicles", "Robotic arms", "Simulation systems"]
-    }}
-}}
-
-### Pre-extracted Data:
-{pre_extracted}
-
-### Raw Content from the Webpage:
-{raw_content}
-
-### OCR content from images on Webpage:
-{ocr_content}
-
-### Output:
-Return a valid JSON object that strictly follows the schema above.  
-**REMINDER**: If the information in both the pre-extracted data and raw content is not closely related to science and engineering university research labs, research, or potential startups, you MUST return a JSON object with all fields blank or empty.
-"""
-
-     # Step 1: Try Groq (LLAMA-3) API
-    try:
-        client = Groq(api_key=GROQ_API_KEY)
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama3-70b-8192", #"deepseek-r1-distill-llama-70b"
-        )
-        completion_text = chat_completion.choices[0].message.content
-        print("Groq API Response:", completion_text)
 
-        start, end = completion_text.find('{'), completion_text.rfind('}')
-        if start == -1 or end == -1:
-            print("No JSON object found in Groq response")
-            raise ValueError("No JSON found in Groq output")
+    return PROMPT_TEMPLATE.render(pre_extracted=pre_extracted, raw_content=raw_content, ocr_content=ocr_content)
 
-        json_str = completion_text[start:end + 1]
-        extracted_data = json.loads(json_str)
-        print("Successfully extracted data with Groq LLM")
-        return extracted_data
+def _parse_completion(completion_text: str) -> dict:
+    """Return the outermost JSON object in a model response."""
+    start, end = completion_text.find('{'), completion_text.rfind('}')
+    if start == -1 or end == -1:
+        raise ValueError("No JSON found in LLM output")
+    return orjson.loads(completion_text[start:end + 1])
 
-    except Exception as e:
-        print(f"Error with Groq API: {e}")
+def _retry_after(error: RateLimitError) -> float:
+    """Seconds Groq asked us to wait, or the default cooldown."""
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return GROQ_RATE_LIMIT_COOLDOWN_SECONDS
 
-    # Step 2: Fallback to Google Gemini if Groq fails
-    if GOOGLE_API_KEY:
-        print("Falling back to Google Gemini 2.0 Flash...")
+@contextlib.asynccontextmanager
+async def _provider_slot(slots: threading.BoundedSemaphore):
+    """Hold one of a provider's process-wide slots without blocking the event loop."""
+    if not slots.acquire(blocking=False):
+        acquiring = asyncio.ensure_future(asyncio.to_thread(slots.acquire))
         try:
-            client = genai.Client(api_key=GOOGLE_API_KEY)
-            response = client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=[{"parts": [{"text": prompt}]}]
-            )
-            completion_text = response.text
-            print("Google Gemini Response:", completion_text)
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The worker thread still takes the slot; hand it straight back
+            acquiring.add_done_callback(lambda _: slots.release())
+            raise
+    try:
+        yield
+    finally:
+        slots.release()
 
-            start, end = completion_text.find('{'), completion_text.rfind('}')
-            if start == -1 or end == -1:
-                print("No JSON object found in Google Gemini response")
-                return {"error": "No JSON object found in Google Gemini response", "response": completion_text}
+async def _extract_one(prompt: str, groq_client, gemini_client) -> dict:
+    """Run one prompt through Groq, falling back to Google Gemini."""
+    global _groq_paused_until
 
-            json_str = completion_text[start:end + 1]
-            extracted_data = json.loads(json_str)
-            print("Successfully extracted data with Google Gemini LLM")
+    # Step 1: Try Groq (LLAMA-3) API unless it is rate limiting us
+    if time.monotonic() < _groq_paused_until:
+        print("Groq is rate limited; sending prompt to Google Gemini")
+    else:
+        try:
+            async with _provider_slot(_GROQ_SLOTS):
+                chat_completion = await asyncio.wait_for(
+                    groq_client.chat.completions.create(
+                        messages=[
+                            {
+                                "role": "user",
+                                "content": prompt,
+                            }
+                        ],
+                        model="llama3-70b-8192", #"deepseek-r1-distill-llama-70b"
+                    ),
+                    LLM_TIMEOUT_SECONDS,
+                )
+            completion_text = chat_completion.choices[0].message.content
+            print("Groq API Response:", completion_text)
+            extracted_data = _parse_completion(completion_text)
+            print("Successfully extracted data with Groq LLM")
             return extracted_data
 
+        except RateLimitError as e:
+            cooldown = _retry_after(e)
+            _groq_paused_until = max(_groq_paused_until, time.monotonic() + cooldown)
+            print(f"Groq rate limit hit, using Google Gemini for the next {cooldown:.0f}s")
         except Exception as e:
-            print(f"Error with Google Gemini: {e}")
-            return {"error": f"Google Gemini Error: {str(e)}"}
-    else:
+            print(f"Error with Groq API: {e}")
+
+    # Step 2: Fallback to Google Gemini if Groq fails
+    if gemini_client is None:
         print("No Google API key available for fallback")
-        return {"error": "Groq failed and no Google API key provided"}
\ No newline at end of file
+        return {"error": "Groq failed and no Google API key provided"}
+
+    print("Falling back to Google Gemini 2.0 Flash...")
+    try:
+        async with _provider_slot(_GEMINI_SLOTS):
+            response = await asyncio.wait_for(
+                gemini_client.aio.models.generate_content(
+                    model="gemini-2.0-flash",
+                    contents=[{"parts": [{"text": prompt}]}]
+                ),
+                LLM_TIMEOUT_SECONDS,
+            )
+        completion_text = response.text
+        print("Google Gemini Response:", completion_text)
+        try:
+            extracted_data = _parse_completion(completion_text)
+        except ValueError:
+            print("No JSON object found in Google Gemini response")
+            return {"error": "No JSON object found in Google Gemini response", "response": completion_text}
+        print("Successfully extracted data with Google Gemini LLM")
+        return extracted_data
+
+    except Exception as e:
+        print(f"Error with Google Gemini: {e}")
+        return {"error": f"Google Gemini Error: {str(e)}"}
+
+async def extract_info_with_llm_batch(items: list) -> list:
+    """Extract structured data for several pages at once, one concurrent LLM call per page."""
+    print(f"Extracting information with LLM for {len(items)} page(s)...")
+
+    prompts = [_build_prompt(data) for data in items]
+    keys = [_cache_key(prompt) for prompt in prompts]
+    results = [_cache_get(key) for key in keys]
+    misses = [i for i, result in enumerate(results) if result is None]
+    if len(misses) < len(items):
+        print(f"LLM cache hit for {len(items) - len(misses)} page(s)")
+    if not misses:
+        return results
+
+    if not GROQ_API_KEY:
+        print("Error: GROQ_API_KEY is not set")
+        for i in misses:
+            results[i] = {"error": "GROQ_API_KEY is not set"}
+        return results
+    if not GOOGLE_API_KEY:
+        print("Warning: GOOGLE_API_KEY is not set; Google Gemini backup will not work")
+
+    groq_client = AsyncGroq(api_key=GROQ_API_KEY)
+    gemini_client = genai.Client(api_key=GOOGLE_API_KEY) if GOOGLE_API_KEY else None
+    try:
+        extracted = await asyncio.gather(
+            *(_extract_one(prompts[i], groq_client, gemini_client) for i in misses)
+        )
+    finally:
+        await groq_client.close()
+
+    for i, extracted_data in zip(misses, extracted):
+        results[i] = extracted_data
+        if isinstance(extracted_data, dict) and "error" not in extracted_data:
+            _cache_set(keys[i], extracted_data)
+    return results
+
+def extract_info_with_llm(data: dict):
+    """Use Groq API as primary and Google Gemini as backup to extract structured data."""
+    return asyncio.run(extract_info_with_llm_batch([data]))[0]
@@ -1,15 +1,17 @@
 from urllib.parse import urljoin, urlparse
-import requests
+import asyncio
+import httpx
 from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
+import itertools
 import logging
-from typing import Set, List, Tuple
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import math
+from typing import FrozenSet, Set, List, Tuple
 import tldextract
-import backoff
 import re
 import os
 import time
-from sentence_transformers import SentenceTransformer, util
 import numpy as np
 import utils.state 
 from utils.config import load_config
@@ -17,6 +19,7 @@ from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from threading import Lock
 from contextlib import contextmanager
+from functools import lru_cache
 
 logger = logging.getLogger(__name__)
 
@@ -28,17 +31,16 @@ MAX_DEPTH = config['MAX_DEPTH']
 MAX_URLS = config['MAX_URLS']
 TIMEOUT_SECONDS = config['TIMEOUT_SECONDS']
 
-SESSION = requests.Session()
-SESSION.headers.update({
+HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
     "Accept-Language": "en-US,en;q=0.9",
-})
+}
+# Only HTML is parsed for links, and only this much of it
+HTML_CONTENT_TYPES = {"text/html", "application/xhtml+xml"}
+MAX_HTML_BYTES = 2 * 1024 * 1024
 
 start_time = time.time()
 
-# Load sentence-transformers model
-model = SentenceTransformer('all-MiniLM-L6-v2')
-
 # Updated keywords targeting science lab solutions and innovative research
 LAB_KEYWORDS = [
     "science lab", "research lab", "laboratory", "experiment", "scientific research",
@@ -49,11 +51,38 @@ LAB_KEYWORDS = [
     "faculty", "department", "science", "chemistry"
 ]
 ACADEMIC_KEYWORDS = ["faculty", "department", "science", "research", "lab", "laboratory", "institute"]
+_EXCLUDED_PATH_RE = re.compile(r"(login|signup|auth|\.pdf|\.docx?|media|news|governance|events|student|blog)", re.I)
 
-# Pre-computed category embeddings
-lab_embedding = model.encode(" ".join(LAB_KEYWORDS))
 STARTUP_KEYWORDS = ["startup", "venture", "accelerator", "incubator", "entrepreneur", "funding"]
-startup_embedding = model.encode(" ".join(STARTUP_KEYWORDS))
+
+@lru_cache(maxsize=1)
+def get_model():
+    """Sentence-transformers model, loaded on first use rather than at import."""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer('all-MiniLM-L6-v2')
+
+def _encode(texts: List[str]) -> np.ndarray:
+    """Unit-normalized embeddings for texts, encoding each distinct text once.
+
+    Menus and footers repeat the same anchor text across many links, so the
+    model only sees the unique strings and rows are gathered back in order."""
+    unique = list(dict.fromkeys(texts))
+    if len(unique) == len(texts):
+        return get_model().encode(texts, batch_size=64, normalize_embeddings=True)
+    index = {text: i for i, text in enumerate(unique)}
+    embeddings = get_model().encode(unique, batch_size=64, normalize_embeddings=True)
+    return embeddings[[index[text] for text in texts]]
+
+def _category_vector(keywords: List[str]) -> np.ndarray:
+    """Unit-length centroid of the individually embedded keywords."""
+    centroid = get_model().encode(keywords, normalize_embeddings=True).mean(axis=0)
+    return centroid / (np.linalg.norm(centroid) + 1e-9)
+
+@lru_cache(maxsize=1)
+def get_category_matrix() -> np.ndarray:
+    """Category embeddings, one unit row per category (lab, startup), so cosine
+    similarity against both is a single matmul with normalized inputs."""
+    return np.stack([_category_vector(LAB_KEYWORDS), _category_vector(STARTUP_KEYWORDS)])
 
 # Selenium driver management
 SELENIUM_LOCK = Lock()
@@ -85,7 +114,7 @@ def cleanup_selenium_driver():
             logging.info("Cleaned up Selenium driver")
 
 ### Utility Functions
-def load_university_domains(file_path: str = 'data/universities.txt') -> Set[str]:
+def load_university_domains(file_path: str = 'data/universities.txt') -> FrozenSet[str]:
     """Load and validate university domains."""
     logging.info(f"Loading university domains from {file_path}")
     domains = set()
@@ -101,33 +130,48 @@ def load_university_domains(file_path: str = 'data/universities.txt') -> Set[str
                 else:
                     logging.warning(f"Invalid domain format: {line}")
         logging.info(f"Loaded {len(domains)} validated university domains")
-        return domains
+        return frozenset(domains)
     except FileNotFoundError:
         logging.error(f"University domains file not found: {file_path}")
-        return set()
+        return frozenset()
+
+@lru_cache(maxsize=200_000)
+def _registered_domain(netloc: str) -> str:
+    """Registered domain (e.g. knust.edu.gh) of a host, memoised since pages link to few hosts."""
+    return tldextract.extract(netloc).registered_domain.lower()
 
 def is_university_domain(url: str, university_domains: Set[str]) -> bool:
     """Check if a URL belongs to a university domain, including subdomains."""
-    extracted = tldextract.extract(url)
-    domain = extracted.registered_domain.lower()
-    return domain in university_domains
-
-@backoff.on_exception(
-    backoff.expo,
-    (requests.exceptions.RequestException, requests.exceptions.Timeout),
-    max_tries=3,
-    jitter=backoff.full_jitter(60))
-def fetch_url(url: str) -> Tuple[str, str]:
+    return _registered_domain(urlparse(url).netloc) in university_domains
+
+def _fetch_with_selenium(url: str) -> Tuple[str, str]:
+    with get_selenium_driver() as driver:
+        driver.get(url)
+        html = driver.page_source
+        logging.debug(f"Selenium fetch successful for {url}")
+        return (url, html) if html else (url, None)
+
+async def fetch_url(client: httpx.AsyncClient, url: str) -> Tuple[str, str]:
     """Fetch URL content with robust error handling, using Selenium only for academic URLs."""
-    # Try static fetch first
+    # Try static fetch first, streaming so non-HTML bodies are never downloaded
     try:
-        response = SESSION.get(url, timeout=REQUEST_TIMEOUT)
-        if response.status_code == 404:
-            logging.warning(f"URL not found (404): {url}")
-            return (url, None)
-        response.raise_for_status()
-        logging.debug(f"Static fetch successful for {url}")
-        return (url, response.text)
+        async with client.stream("GET", url) as response:
+            if response.status_code == 404:
+                logging.warning(f"URL not found (404): {url}")
+                return (url, None)
+            response.raise_for_status()
+            content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type and content_type not in HTML_CONTENT_TYPES:
+                logging.debug(f"Skipping non-HTML content ({content_type}) at {url}")
+                return (url, None)
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) >= MAX_HTML_BYTES:
+                    logging.debug(f"Truncated {url} at {MAX_HTML_BYTES} bytes")
+                    break
+            logging.debug(f"Static fetch successful for {url}")
+            return (url, body[:MAX_HTML_BYTES].decode(response.encoding or "utf-8", errors="replace"))
     except Exception as e:
         # Only use Selenium for URLs likely to be academic
         path = urlparse(url).path.lower()
@@ -136,11 +180,7 @@ def fetch_url(url: str) -> Tuple[str, str]:
             return (url, None)
         logging.warning(f"Static fetch failed for {url}: {str(e)}, trying Selenium")
         try:
-            with get_selenium_driver() as driver:
-                driver.get(url)
-                html = driver.page_source
-                logging.debug(f"Selenium fetch successful for {url}")
-                return (url, html) if html else (url, None)
+            return await asyncio.to_thread(_fetch_with_selenium, url)
         except Exception as se:
             logging.warning(f"Selenium fetch failed for {url}: {str(se)}")
             return (url, None)
@@ -156,31 +196,65 @@ def normalize_anchor_text(text: str, url: str = "") -> str:
         text = path.replace('/', ' ').replace('-', ' ')
     return text or "unknown"
 
-def extract_links(html: str, base_url: str) -> Set[Tuple[str, str]]:
-    """Extract links with their anchor text, ensuring hyphenated paths are captured."""
+def _parse_html(html: str):
+    """Parse a page with lxml.html; None if the document is empty or unparsable."""
+    try:
+        try:
+            return lxml.html.fromstring(html)
+        except ValueError:
+            # lxml refuses str input that carries an XML encoding declaration
+            return lxml.html.fromstring(html.encode('utf-8'))
+    except etree.ParserError:
+        return None
+
+def _canonical_url(url: str) -> str:
+    """Crawl key for a URL: no fragment and no trailing slash, so one page is fetched once."""
+    return url.split('#')[0].rstrip('/')
+
+def extract_links(html: str, base_url: str) -> Tuple[List[str], List[str]]:
+    """Extract links with their anchor text, ensuring hyphenated paths are captured.
+
+    Returns parallel lists of unique URLs and their (first seen) normalized anchor text.
+    """
+    urls: List[str] = []
+    anchors: List[str] = []
     if not html:
-        return set()
-    soup = BeautifulSoup(html, 'lxml')
-    links_with_anchor = set()
-    for a in soup.find_all('a', href=True):
-        href = a.get('href', '')
+        return urls, anchors
+    doc = _parse_html(html)
+    if doc is None:
+        return urls, anchors
+    seen = set()
+    for a in doc.iter('a'):
+        href = a.get('href')
+        if href is None:
+            continue
         logging.debug(f"Raw href: {href}")
-        full_url = urljoin(base_url, href).split('#')[0].rstrip('/')
-        anchor_text = a.get_text(strip=True)
+        full_url = _canonical_url(urljoin(base_url, href))
+        anchor_text = a.text_content().strip()
         normalized_anchor = normalize_anchor_text(anchor_text, full_url)
         logging.debug(f"Extracted link: {full_url} | Raw Anchor: {anchor_text} | Normalized Anchor: {normalized_anchor}")
+        if full_url in seen:
+            continue
         if is_valid_url(full_url):
-            links_with_anchor.add((full_url, normalized_anchor))
+            seen.add(full_url)
+            urls.append(full_url)
+            anchors.append(normalized_anchor)
         else:
             logging.debug(f"Filtered out invalid URL: {full_url}")
-    return links_with_anchor
+    return urls, anchors
+
+@lru_cache(maxsize=4096)
+def extract_domain(url: str) -> str:
+    """Return the lowercased host of url without a leading 'www.'."""
+    netloc = urlparse(url).netloc.lower()
+    return netloc[4:] if netloc.startswith('www.') else netloc
 
 def is_valid_url(url: str) -> bool:
     """Validate URL format and exclude unwanted patterns."""
     parsed = urlparse(url)
     path = parsed.path.lower()
     # Exclude media, news, governance, and other irrelevant patterns
-    if re.search(r"(login|signup|auth|\.pdf|\.docx?|media|news|governance|events|student|blog)", path, re.I):
+    if _EXCLUDED_PATH_RE.search(path):
         return False
     return (
         parsed.scheme in {'http', 'https'}
@@ -195,15 +269,14 @@ def get_page_content(html: str) -> str:
     return ' '.join(soup.get_text().split()[:200])  # Limit to 200 words
 
 ### Semantic Classification Function
-def categorize_urls_with_semantics(links_with_anchor: Set[Tuple[str, str]], university_domains: Set[str], html: str) -> Tuple[Set[Tuple[str, str]], Set[Tuple[str, str]]]:
+def categorize_urls_with_semantics(urls: List[str], anchors: List[str], university_domains: Set[str], html: str) -> Tuple[Set[Tuple[str, str]], Set[Tuple[str, str]]]:
     """Categorize URLs using semantic similarity, filtering out irrelevant paths."""
     lab_urls = set()
     startup_urls = set()
 
-    page_content = get_page_content(html)
-    page_embedding = model.encode(page_content) if page_content else None
-
-    for url, anchor_text in links_with_anchor:
+    # Filter first so only the surviving links are embedded
+    cand_urls, cand_anchors, cand_paths, contexts = [], [], [], []
+    for url, anchor_text in zip(urls, anchors):
         if not is_university_domain(url, university_domains):
             logging.debug(f"Skipping non-university URL: {url}")
             continue
@@ -212,27 +285,41 @@ def categorize_urls_with_semantics(links_with_anchor: Set[Tuple[str, str]], univ
         if not any(kw in path for kw in ACADEMIC_KEYWORDS):
             logging.debug(f"Skipping non-academic URL: {url}")
             continue
+        cand_urls.append(url)
+        cand_anchors.append(anchor_text)
+        cand_paths.append(path)
+        contexts.append(anchor_text if anchor_text and anchor_text != "unknown" else path.replace('/', ' ').replace('-', ' '))
+
+    if not cand_urls:
+        return lab_urls, startup_urls
+
+    # One batched encode for every context plus the page, instead of a model call per link
+    page_content = get_page_content(html)
+    texts = contexts + [page_content] if page_content else contexts
+    embeddings = _encode(texts)
+
+    # Compute similarities
+    scores = embeddings @ get_category_matrix().T
+    lab_scores = scores[:, 0].tolist()
+    startup_scores = scores[:, 1].tolist()
+
+    # Boost score with page content
+    if page_content:
+        page_lab_score = lab_scores.pop() * 0.5
+        page_startup_score = startup_scores.pop() * 0.5
+    else:
+        page_lab_score = page_startup_score = float('-inf')
+
+    for url, anchor_text, path, lab_score, startup_score in zip(cand_urls, cand_anchors, cand_paths, lab_scores, startup_scores):
+        lab_score = max(lab_score, page_lab_score)
+        startup_score = max(startup_score, page_startup_score)
 
-        context = anchor_text if anchor_text and anchor_text != "unknown" else path.replace('/', ' ').replace('-', ' ')
-        context_embedding = model.encode(context)
-        
-        # Compute similarities
-        lab_score = util.cos_sim(context_embedding, lab_embedding)[0][0]
-        startup_score = util.cos_sim(context_embedding, startup_embedding)[0][0]
-        
-        # Boost score with page content
-        if page_embedding is not None:
-            page_lab_score = util.cos_sim(page_embedding, lab_embedding)[0][0]
-            page_startup_score = util.cos_sim(page_embedding, startup_embedding)[0][0]
-            lab_score = max(lab_score, page_lab_score * 0.5)
-            startup_score = max(startup_score, page_startup_score * 0.5)
-        
         # Boost multi-word academic terms
         if any(kw in (anchor_text.lower() + ' ' + path) for kw in ACADEMIC_KEYWORDS):
             lab_score += 0.2  # Increased boost for academic terms
-        
+
         logging.debug(f"Link: {url} | Anchor: {anchor_text} | Path: {path} | Lab Score: {lab_score:.2f} | Startup Score: {startup_score:.2f}")
-        
+
         # Categorize with tightened threshold
         if lab_score > startup_score and lab_score > 0.5:
             lab_urls.add((url, anchor_text))
@@ -241,74 +328,109 @@ def categorize_urls_with_semantics(links_with_anchor: Set[Tuple[str, str]], univ
 
     return lab_urls, startup_urls
 
+def _score_sublinks(sublinks: Set[str], urls: List[str], anchors: List[str]) -> List[Tuple[str, float]]:
+    """Semantic lab score for each sublink, best first."""
+    anchor_by_url = dict(zip(urls, anchors))
+    sublinks = list(sublinks)
+    anchor_list = [anchor_by_url.get(link, "") for link in sublinks]
+    paths = [urlparse(link).path.lower() for link in sublinks]
+    contexts = [anchor or path.replace('/', ' ').replace('-', ' ') for anchor, path in zip(anchor_list, paths)]
+    lab_embedding = get_category_matrix()[0]
+    lab_scores = (_encode(contexts) @ lab_embedding).tolist()
+    prioritized = []
+    for link, anchor, path, lab_score in zip(sublinks, anchor_list, paths, lab_scores):
+        # Boost multi-word academic URLs
+        if any(kw in (anchor.lower() or path) for kw in ACADEMIC_KEYWORDS):
+            lab_score += 0.2
+        prioritized.append((link, lab_score))
+    prioritized.sort(key=lambda x: x[1], reverse=True)
+    return prioritized
+
+def _crawl_budget_left(visited_urls: Set[str]) -> bool:
+    return len(visited_urls) < MAX_URLS and (time.time() - start_time) <= TIMEOUT_SECONDS
+
 ### Core Processing Function
-def process_directory(url: str, university_domains: Set[str], visited_urls: Set[str], depth: int = 0) -> Tuple[Set[Tuple[str, str]], Set[Tuple[str, str]]]:
-    """Recursively crawl directories and categorize URLs."""
-    if depth > MAX_DEPTH or url in visited_urls or len(visited_urls) >= MAX_URLS or (time.time() - start_time) > TIMEOUT_SECONDS:
+async def process_directory(client: httpx.AsyncClient, url: str, university_domains: Set[str], visited_urls: Set[str], depth: int = 0) -> Tuple[Set[Tuple[str, str]], Set[Tuple[str, str]], List[Tuple[str, float]]]:
+    """Fetch and categorize one directory page.
+
+    Returns its lab and startup URLs plus the (url, score) sublinks worth crawling next, best first.
+    """
+    if depth > MAX_DEPTH or url in visited_urls or not _crawl_budget_left(visited_urls):
         logging.info(f"Stopping at {url}: Depth {depth}, Visited {len(visited_urls)}, Time elapsed {int(time.time() - start_time)}s")
-        return set(), set()
+        return set(), set(), []
     
-    if not utils.state.crawler_running_event.is_set():
+    if not utils.state.is_running():
         logger.info(f"Stopping at {url}: Crawler stopped by user")
-        return set(), set()
+        return set(), set(), []
 
     logging.info(f"Processing directory at depth {depth}: {url} (Visited: {len(visited_urls)})")
     visited_urls.add(url)
-    url_lab_urls: Set[Tuple[str, str]] = set()
-    url_startup_urls: Set[Tuple[str, str]] = set()
 
     # Fetch and parse the page
-    _, html = fetch_url(url)
+    _, html = await fetch_url(client, url)
     if not html:
-        return url_lab_urls, url_startup_urls
+        return set(), set(), []
 
     # Extract links with anchor text
-    links_with_anchor = extract_links(html, url)
-
-    # Categorize using semantic analysis
-    lab_urls, startup_urls = categorize_urls_with_semantics(links_with_anchor, university_domains, html)
-    url_lab_urls.update(lab_urls)
-    url_startup_urls.update(startup_urls)
-
-    # Filter and prioritize sublinks
-    all_sublinks = {link[0] for link in links_with_anchor}
-    university_sublinks = {link for link in all_sublinks if is_university_domain(link, university_domains)}
-    sublinks = university_sublinks - visited_urls
-    
-    # Prioritize sublinks with balanced scoring
-    if sublinks:
-        prioritized = []
-        for link in sublinks:
-            anchor = next((a for u, a in links_with_anchor if u == link), "")
-            path = urlparse(link).path.lower()
-            lab_score = util.cos_sim(model.encode(anchor or path.replace('/', ' ').replace('-', ' ')), lab_embedding)[0][0]
-            # Boost multi-word academic URLs
-            if any(kw in (anchor.lower() or path) for kw in ACADEMIC_KEYWORDS):
-                lab_score += 0.2
-            prioritized.append((link, anchor, lab_score))
-        prioritized = sorted(prioritized, key=lambda x: x[2], reverse=True)
-        sublinks = [url for url, _, _ in prioritized]
-        logging.info(f"Prioritized {len(sublinks)} sublinks at depth {depth} for {url}")
-
-    if depth + 1 <= MAX_DEPTH and sublinks:
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = {
-                executor.submit(process_directory, sub_url, university_domains, visited_urls, depth + 1): sub_url
-                for sub_url in sublinks if len(visited_urls) < MAX_URLS and (time.time() - start_time) <= TIMEOUT_SECONDS
-            }
-            for future in as_completed(futures):
-                if not utils.state.crawler_running_event.is_set():
-                    logger.info("Stopping sublink processing: Crawler stopped by user")
-                    break
-                try:
-                    sub_lab_urls, sub_startup_urls = future.result()
-                    url_lab_urls.update(sub_lab_urls)
-                    url_startup_urls.update(sub_startup_urls)
-                except Exception as e:
-                    sub_url = futures[future]
-                    logging.error(f"Error processing sublink {sub_url}: {str(e)}")
-
-    return url_lab_urls, url_startup_urls
+    link_urls, link_anchors = extract_links(html, url)
+
+    # Categorize using semantic analysis (model inference runs off the event loop)
+    lab_urls, startup_urls = await asyncio.to_thread(categorize_urls_with_semantics, link_urls, link_anchors, university_domains, html)
+
+    # Filter and prioritize sublinks with balanced scoring
+    if depth + 1 > MAX_DEPTH:
+        return lab_urls, startup_urls, []
+    sublinks = {link for link in link_urls if link not in visited_urls and is_university_domain(link, university_domains)}
+    if not sublinks:
+        return lab_urls, startup_urls, []
+    scored_sublinks = await asyncio.to_thread(_score_sublinks, sublinks, link_urls, link_anchors)
+    logging.info(f"Prioritized {len(scored_sublinks)} sublinks at depth {depth} for {url}")
+    return lab_urls, startup_urls, scored_sublinks
+
+async def _crawl_directories(directory_urls: Set[str], university_domains: Set[str]) -> Tuple[Set[Tuple[str, str]], Set[Tuple[str, str]]]:
+    """Crawl directory URLs best-first over one shared keep-alive client.
+
+    A fixed pool of workers pulls pages from one priority queue, highest sublink
+    score first, so the MAX_URLS budget is spent on the most lab-like pages.
+    """
+    all_lab_urls: Set[Tuple[str, str]] = set()
+    all_startup_urls: Set[Tuple[str, str]] = set()
+    visited_urls = set()
+    queue = asyncio.PriorityQueue()
+    order = itertools.count()  # FIFO among equal scores; never compare further
+
+    # Seed lines may differ from discovered links only by a trailing slash or
+    # fragment; key them the same way so each page is fetched once
+    for url in dict.fromkeys(_canonical_url(url) for url in directory_urls):
+        queue.put_nowait((-math.inf, next(order), url, 0))
+
+    async def worker():
+        while True:
+            _, _, url, depth = await queue.get()
+            try:
+                lab_urls, startup_urls, sublinks = await process_directory(client, url, university_domains, visited_urls, depth)
+                all_lab_urls.update(lab_urls)
+                all_startup_urls.update(startup_urls)
+                if sublinks and _crawl_budget_left(visited_urls) and utils.state.is_running():
+                    for sub_url, score in sublinks:
+                        queue.put_nowait((-score, next(order), sub_url, depth + 1))
+            except Exception as e:
+                logging.error(f"Error processing {url}: {str(e)}")
+            finally:
+                queue.task_done()
+
+    # MAX_WORKERS pages are fetched at once across the whole directory crawl;
+    # the httpx pool keeps that many connections alive for reuse.
+    limits = httpx.Limits(max_connections=MAX_WORKERS, max_keepalive_connections=MAX_WORKERS)
+    async with httpx.AsyncClient(headers=HEADERS, timeout=REQUEST_TIMEOUT, limits=limits, follow_redirects=True) as client:
+        workers = [asyncio.create_task(worker()) for _ in range(MAX_WORKERS)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    return all_lab_urls, all_startup_urls
 
 ### Main URL Generation Function
 def generate_urls():
@@ -316,7 +438,7 @@ def generate_urls():
     global start_time
     start_time = time.time()
 
-    if not utils.state.crawler_running_event.is_set():
+    if not utils.state.is_running():
         logger.info("Generating URLs stopped before starting")
         return
 
@@ -338,23 +460,7 @@ def generate_urls():
             logging.error("data/potential_directories.txt not found")
             return
 
-        all_lab_urls: Set[Tuple[str, str]] = set()
-        all_startup_urls: Set[Tuple[str, str]] = set()
-        visited_urls = set()
-
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = {
-                executor.submit(process_directory, url, university_domains, visited_urls): url
-                for url in directory_urls
-            }
-            for future in as_completed(futures):
-                try:
-                    lab_urls, startup_urls = future.result()
-                    all_lab_urls.update(lab_urls)
-                    all_startup_urls.update(startup_urls)
-                except Exception as e:
-                    url = futures[future]
-                    logging.error(f"Error processing {url}: {str(e)}")
+        all_lab_urls, all_startup_urls = asyncio.run(_crawl_directories(directory_urls, university_domains))
 
         merged_urls = all_lab_urls | all_startup_urls
         logging.info(f"Discovered {len(merged_urls)} unique URLs")
@@ -372,7 +478,7 @@ def generate_urls():
     finally:
         cleanup_selenium_driver()  # Ensure driver is closed
 
-    if not utils.state.crawler_running_event.is_set():
+    if not utils.state.is_running():
         logger.info("URL generation stopped by user")
         return
 
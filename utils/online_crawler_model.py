@@ -1,11 +1,14 @@
 import numpy as np
 from sklearn.linear_model import SGDClassifier
 from sklearn.preprocessing import StandardScaler
+import atexit
 import joblib
 import os
-import re
 
 class OnlineLearningCrawler:
+    # partial_fit calls between writes to disk; the rest are saved by flush_model or at exit
+    SAVE_EVERY = 100
+
     def __init__(self, model_file='models/online_model.pkl', scaler_file='models/scaler.pkl', updates_file='models/total_updates.pkl'):
         self.model_file = model_file
         self.scaler_file = scaler_file
@@ -14,7 +17,9 @@ class OnlineLearningCrawler:
         self.scaler = StandardScaler()
         self.classes = [0, 1]  # 0: irrelevant, 1: relevant
         self.total_updates = 0
+        self.unsaved_updates = 0
         self.load_model()
+        atexit.register(self.flush_model)
 
     def load_model(self):
         """Load the model, scaler, and total_updates if they exist, otherwise initialize new ones."""
@@ -35,85 +40,82 @@ class OnlineLearningCrawler:
         joblib.dump(self.model, self.model_file)
         joblib.dump(self.scaler, self.scaler_file)
         joblib.dump(self.total_updates, self.updates_file)
+        self.unsaved_updates = 0
+
+    def flush_model(self):
+        """Save the model if it has updates that are not on disk yet."""
+        if self.unsaved_updates:
+            self.save_model()
+
+    # General keywords (lower weight)
+    GENERAL_KEYWORDS = (
+        'energy', 'centre', 'center', 'startup', 'programme', 'institute', 'academic', 'calendar',
+        'education', 'faculty', 'department', 'project', 'course', 'study', 'scholarship',
+        'conference', 'seminar', 'workshop', 'development', 'training', 'graduate', 'undergraduate',
+        'admissions', 'curriculum', 'technology', 'science', 'clean', 'funds', 'funding'
+    )
+
+    # High-priority keywords (higher weight)
+    HIGH_PRIORITY_KEYWORDS = (
+        'research', 'laboratory', 'lab', 'innovation', 'publications', 'research-centre'
+    )
+    HIGH_PRIORITY_WEIGHT = 5
+
+    # Column order of the model's feature matrix
+    FEATURE_NAMES = (
+        'general_keyword_count', 'general_anchor_count', 'high_priority_keyword_count',
+        'high_priority_anchor_count', 'parent_relevance', 'url_depth', 'url_length',
+        'query_params', 'is_pdf'
+    )
 
     def extract_features(self, url: str, anchor_text: str, parent_relevance: float) -> dict:
-        """Extract an expanded set of features from a link with weighted high-priority keywords."""
-        # General keywords (lower weight)
-        general_keywords = [
-            'energy', 'centre', 'center', 'startup', 'programme', 'institute', 'academic', 'calendar',
-            'education', 'faculty', 'department', 'project', 'course', 'study', 'scholarship',
-            'conference', 'seminar', 'workshop', 'development', 'training', 'graduate', 'undergraduate',
-            'admissions', 'curriculum', 'technology', 'science', 'clean', 'funds', 'funding'
-        ]
-        
-        # High-priority keywords (higher weight)
-        high_priority_keywords = [
-            'research', 'laboratory', 'lab', 'innovation', 'publications', 'research-centre'
-        ]
-
-        # Count occurrences
-        general_keyword_count = sum(1 for kw in general_keywords if kw in url.lower())
-        general_anchor_count = sum(1 for kw in general_keywords if kw in anchor_text.lower())
-        
-        # Count high-priority keywords and apply a weight of 5
-        HIGH_PRIORITY_WEIGHT = 5
-        high_priority_keyword_count = HIGH_PRIORITY_WEIGHT * sum(1 for kw in high_priority_keywords if kw in url.lower())
-        high_priority_anchor_count = HIGH_PRIORITY_WEIGHT * sum(1 for kw in high_priority_keywords if kw in anchor_text.lower())
-
-        # Additional features
-        url_depth = url.count('/') - 2
-        url_length = len(url)
-        query_params = len(re.findall(r'\?', url))
-        is_pdf = 1 if url.lower().endswith('.pdf') else 0
-
-        print(f"Anchor text: {anchor_text}")
-        return {
-            'general_keyword_count': general_keyword_count,
-            'general_anchor_count': general_anchor_count,
-            'high_priority_keyword_count': high_priority_keyword_count,
-            'high_priority_anchor_count': high_priority_anchor_count,
-            'parent_relevance': parent_relevance,
-            'url_depth': url_depth,
-            'url_length': url_length,
-            'query_params': query_params,
-            'is_pdf': is_pdf
-        }
+        """Features of a single link by name; a view over _feature_matrix."""
+        return dict(zip(self.FEATURE_NAMES, self._feature_matrix([(url, anchor_text, parent_relevance)])[0].tolist()))
 
-    def predict(self, url: str, anchor_text: str, parent_relevance: float) -> float:
-        """Predict the probability that a link is relevant."""
+    def _feature_matrix(self, items) -> np.ndarray:
+        """Feature matrix for (url, anchor_text, parent_relevance) links, columns ordered as FEATURE_NAMES.
+
+        Used for both training and prediction, and filled a column at a time so a
+        batch costs one pass of string work per column."""
+        urls = [url for url, _, _ in items]
+        urls_lower = [url.lower() for url in urls]
+        anchors_lower = [anchor_text.lower() for _, anchor_text, _ in items]
+
+        def keyword_hits(texts, keywords):
+            return [sum(kw in text for kw in keywords) for text in texts]
+
+        features = np.empty((len(items), len(self.FEATURE_NAMES)))
+        features[:, 0] = keyword_hits(urls_lower, self.GENERAL_KEYWORDS)
+        features[:, 1] = keyword_hits(anchors_lower, self.GENERAL_KEYWORDS)
+        features[:, 2] = keyword_hits(urls_lower, self.HIGH_PRIORITY_KEYWORDS)
+        features[:, 3] = keyword_hits(anchors_lower, self.HIGH_PRIORITY_KEYWORDS)
+        features[:, 2:4] *= self.HIGH_PRIORITY_WEIGHT
+        features[:, 4] = [parent_relevance for _, _, parent_relevance in items]
+        features[:, 5] = [url.count('/') for url in urls]
+        features[:, 5] -= 2
+        features[:, 6] = [len(url) for url in urls]
+        features[:, 7] = [url.count('?') for url in urls]
+        features[:, 8] = [url.endswith('.pdf') for url in urls_lower]
+        return features
+
+    def predict_batch(self, items) -> np.ndarray:
+        """Predict relevance probabilities for many (url, anchor_text, parent_relevance) links at once."""
         if self.model is None or not hasattr(self.model, 'coef_'):
-            return 0.5  # Default to 50% if no model yet
-
-        features = self.extract_features(url, anchor_text, parent_relevance)
-        feature_array = np.array([[
-            features['general_keyword_count'],
-            features['general_anchor_count'],
-            features['high_priority_keyword_count'],
-            features['high_priority_anchor_count'],
-            features['parent_relevance'],
-            features['url_depth'],
-            features['url_length'],
-            features['query_params'],
-            features['is_pdf']
-        ]])
+            return np.full(len(items), 0.5)  # Default to 50% if no model yet
+        if not items:
+            return np.empty(0)
+
+        feature_array = self._feature_matrix(items)
         scaled_features = self.scaler.transform(feature_array)
-        prob = self.model.predict_proba(scaled_features)[0][1]
-        return prob
+        return self.model.predict_proba(scaled_features)[:, 1]
+
+    def predict(self, url: str, anchor_text: str, parent_relevance: float) -> float:
+        """Predict the probability that a link is relevant."""
+        return float(self.predict_batch([(url, anchor_text, parent_relevance)])[0])
 
     def update_model(self, url: str, anchor_text: str, parent_relevance: float, label: int):
         """Update the model with a new data point."""
-        features = self.extract_features(url, anchor_text, parent_relevance)
-        feature_array = np.array([[
-            features['general_keyword_count'],
-            features['general_anchor_count'],
-            features['high_priority_keyword_count'],
-            features['high_priority_anchor_count'],
-            features['parent_relevance'],
-            features['url_depth'],
-            features['url_length'],
-            features['query_params'],
-            features['is_pdf']
-        ]])
+        feature_array = self._feature_matrix([(url, anchor_text, parent_relevance)])
 
         if not hasattr(self.scaler, 'mean_'):
             self.scaler.partial_fit(feature_array)
@@ -121,5 +123,7 @@ class OnlineLearningCrawler:
 
         self.model.partial_fit(scaled_features, [label], classes=self.classes)
         self.total_updates += 1
-        print(f"Model updated. Total Updates: {self.total_updates}, Label: {label}, Features: {features}")
-        self.save_model()
\ No newline at end of file
+        self.unsaved_updates += 1
+        print(f"Model updated. Total Updates: {self.total_updates}, Label: {label}, Features: {feature_array[0].tolist()}")
+        if self.unsaved_updates >= self.SAVE_EVERY:
+            self.save_model()
\ No newline at end of file
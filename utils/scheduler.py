@@ -1,20 +1,27 @@
 import logging
 import schedule
 import time
-from utils.database import create_db
+from utils.database import create_db, flush_entities
 from utils.helpers import generate_urls
-from utils.workflow import State, app
+from utils.scrapers import selenium_driver_in_use
+from utils.workflow import State, app, online_learner
 from langchain_core.runnables.config import RunnableConfig
 import utils.state  
 
 logger = logging.getLogger(__name__)
 
-def run_workflow(session, quick_scrape=False, initial_url=None):
-    """Execute the LangGraph workflow with stop control, quick scrape option, and error handling."""
+def run_workflow(session, quick_scrape=False, initial_url=None, run_event=None):
+    """Execute the LangGraph workflow with stop control, quick scrape option, and error handling.
+
+    run_event is the event the run stops on; it defaults to crawler_running_event."""
+    with utils.state.bind_run_event(run_event or utils.state.crawler_running_event), selenium_driver_in_use():
+        _run_workflow(session, quick_scrape, initial_url)
+
+def _run_workflow(session, quick_scrape, initial_url):
     logger.info(f"Starting workflow execution (quick_scrape={quick_scrape}, initial_url={initial_url})")
-    logger.info(f"Current crawler_running_event.is_set(): {utils.state.crawler_running_event.is_set()}")
+    logger.info(f"Current run event is_set(): {utils.state.is_running()}")
 
-    if not utils.state.crawler_running_event.is_set() and not quick_scrape:
+    if not utils.state.is_running() and not quick_scrape:
         logger.info("Workflow stopped before starting")
         return
     
@@ -26,13 +33,13 @@ def run_workflow(session, quick_scrape=False, initial_url=None):
             logger.error(f"Error generating URLs: {e}")
             return
         
-        if not utils.state.crawler_running_event.is_set():
+        if not utils.state.is_running():
             logger.info("Workflow stopped after generating URLs")
             return
         
         logger.info("Calling create_db...")
         create_db()
-        if not utils.state.crawler_running_event.is_set():
+        if not utils.state.is_running():
             logger.info("Workflow stopped after initializing database")
             return
     
@@ -54,12 +61,21 @@ def run_workflow(session, quick_scrape=False, initial_url=None):
             logger.warning(f"Unexpected type for final_state: {type(final_state)}")
             status = 'Unknown'
         
-        if (utils.state.crawler_running_event.is_set() or quick_scrape):
+        if (utils.state.is_running() or quick_scrape):
             logger.info(f"Workflow completed with status: {status}")
         else:
             logger.info("Workflow stopped during execution")
     except Exception as e:
         logger.error(f"Error during workflow execution: {e}")
+    finally:
+        try:
+            flush_entities()
+        except Exception as e:
+            logger.error(f"Error flushing buffered entities: {e}")
+        try:
+            online_learner.flush_model()
+        except Exception as e:
+            logger.error(f"Error saving online model: {e}")
 
 # Schedule the workflow to run daily at 08:00
 schedule.every().day.at("08:00").do(run_workflow)
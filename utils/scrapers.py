@@ -1,13 +1,20 @@
+import asyncio
+import contextlib
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
-import time
+from selenium.common.exceptions import TimeoutException
 import re
 import logging
+import time
+import orjson
 import utils.state
 import urllib.parse
 import os
@@ -17,6 +24,7 @@ import io
 from urllib.parse import quote
 from pdf2image import convert_from_bytes
 import pytesseract
+from threading import Lock
 
 load_dotenv()
 
@@ -26,6 +34,37 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
 }
 
+# One pooled session for every scraper request, so requests to the same host
+# reuse keep-alive connections instead of a new TCP/TLS handshake each time
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+_adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=Retry(total=2, backoff_factor=0.3))
+SESSION.mount('https://', _adapter)
+SESSION.mount('http://', _adapter)
+
+# Connection limits for scrape_with_bs_batch, overall and per host
+BATCH_MAX_CONNECTIONS = 32
+BATCH_MAX_PER_HOST = 4
+
+# Patterns used while extracting a page, compiled once
+_RANK_RE = re.compile(r'Ranked #\d+|#\d+', re.I)
+_RANK_NUMBER_RE = re.compile(r'#(\d+)')
+_PUB_HEADING_RE = re.compile(r'publications|research papers|journal articles', re.I)
+_PUB_CLASS_RE = re.compile(r'publications|research', re.I)
+_PUB_TEXT_RE = re.compile(r'paper|article|publication|journal', re.I)
+_PUB_WORD_RE = re.compile(r'\b(paper|article|publication|journal)\b', re.I)
+_NON_PUB_HREF_RE = re.compile(r'home|about|contact|news', re.I)
+_ADDRESS_CLASS_RE = re.compile(r'location|address|contact', re.I)
+_DEPT_RE = re.compile(r'department|faculty|school|centre', re.I)
+FOCUS_KEYWORDS = ('research', 'focus', 'specialize', 'study')
+_SCOPES_RE = re.compile(r'\b(?:AI|machine learning|robotics|biology|physics|chemistry|solar|renewable energy|clean energy)\b', re.I)
+_EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+_PHONE_RE = re.compile(r'\+?\d[\d -]{8,}\d')
+_CONTACT_LINK_RE = re.compile(r'contact|staff|directory', re.I)
+_ABSTRACT_CLASS_RE = re.compile(r'about|research|overview', re.I)
+_EQUIPMENT_RE = re.compile(r'equipment|lab|facility|instrument|apparatus', re.I)
+_PDF_HREF_RE = re.compile(r'\.pdf$', re.I)
+
 # Platform-specific Tesseract path for Windows
 if os.name == 'nt':
     pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
@@ -33,34 +72,66 @@ if os.name == 'nt':
 
 from utils.config import load_config
 
+# Hosts whose stack gave a conclusive answer (static-site server or generator,
+# React/Vue bundle); later URLs on them skip the probe. Capped at
+# MAX_CACHED_HOSTS (oldest host dropped first) and cleared when a crawl starts.
+_HOST_IS_STATIC = {}
+_HOST_CACHE_LOCK = Lock()
+MAX_CACHED_HOSTS = 1024
+STATIC_SERVERS = ('Netlify', 'Vercel', 'GitHub-Pages', 'S3')
+STATIC_GENERATORS = ('Jekyll', 'Hugo', 'Gatsby', 'Next.js')
+MAX_STATIC_HTML_CHARS = 100000
+
+def _remember_host(host, verdict):
+    with _HOST_CACHE_LOCK:
+        if host not in _HOST_IS_STATIC and len(_HOST_IS_STATIC) >= MAX_CACHED_HOSTS:
+            del _HOST_IS_STATIC[next(iter(_HOST_IS_STATIC))]
+        _HOST_IS_STATIC[host] = verdict
+    return verdict
+
+def clear_host_cache():
+    """Forget every cached host verdict, so a new crawl probes hosts afresh."""
+    with _HOST_CACHE_LOCK:
+        _HOST_IS_STATIC.clear()
+
 def is_static(url):
     """Enhanced static detection with better heuristics"""
-    if not utils.state.crawler_running_event.is_set():
+    if not utils.state.is_running():
         logger.info("Scraping stopped by user")
         return False
+
+    host = urllib.parse.urlparse(url).netloc.lower()
+    verdict = _HOST_IS_STATIC.get(host)
+    if verdict is not None:
+        return verdict
     
     try:
-        response = requests.head(url, headers=HEADERS, timeout=10, allow_redirects=True)
+        response = SESSION.head(url, timeout=10, allow_redirects=True)
         
-        static_servers = {'Netlify', 'Vercel', 'GitHub-Pages', 'S3'}
-        if any(server in response.headers.get('Server', '') for server in static_servers):
-            return True
+        if any(server in response.headers.get('Server', '') for server in STATIC_SERVERS):
+            return _remember_host(host, True)
+
+        # Even the compressed size is too big for the static scraper; skip the GET.
+        # Size describes this page, not the host, so it is not cached.
+        content_length = response.headers.get('Content-Length', '')
+        if content_length.isdigit() and int(content_length) >= MAX_STATIC_HTML_CHARS:
+            return False
             
-        response = requests.get(url, headers=HEADERS, timeout=10)
+        response = SESSION.get(url, timeout=10)
         html = response.text
         
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = BeautifulSoup(html, 'lxml')
         
         meta_generator = soup.find('meta', {'name': 'generator'})
         if meta_generator and any(ssg in meta_generator.get('content', '') 
-                                for ssg in ['Jekyll', 'Hugo', 'Gatsby', 'Next.js']):
-            return True
+                                for ssg in STATIC_GENERATORS):
+            return _remember_host(host, True)
             
         script_sources = [script.get('src', '') for script in soup.find_all('script')]
         if any('react' in src or 'vue' in src for src in script_sources):
-            return False
+            return _remember_host(host, False)
             
-        return len(html) < 100000 and not soup.find(id='root')
+        return len(html) < MAX_STATIC_HTML_CHARS and not soup.find(id='root')
         
     except Exception as e:
         logger.error(f"Error checking {url}: {e}")
@@ -68,7 +139,7 @@ def is_static(url):
 
 def extract_raw_content(soup):
     """Extract structured content with enhanced context awareness"""
-    if not utils.state.crawler_running_event.is_set():
+    if not utils.state.is_running():
         logger.info("Scraping stopped by user")
         return ""
     
@@ -156,7 +227,7 @@ def extract_raw_content(soup):
 
 def process_image_ocr(image_url, base_url):
     """Process an image with Tesseract OCR"""
-    if not utils.state.crawler_running_event.is_set():
+    if not utils.state.is_running():
         logger.info("Scraping stopped by user")
         return ""
     
@@ -170,7 +241,7 @@ def process_image_ocr(image_url, base_url):
     
     try:
         full_url = urllib.parse.urljoin(base_url, image_url)
-        response = requests.get(full_url, headers=HEADERS, timeout=10)
+        response = SESSION.get(full_url, timeout=10)
         if response.status_code != 200:
             logger.warning(f"Failed to download image {full_url}: Status {response.status_code}")
             return ""
@@ -195,7 +266,7 @@ def process_image_ocr(image_url, base_url):
 
 def process_pdf_ocr(pdf_url, base_url):
     """Process a PDF with Tesseract OCR"""
-    if not utils.state.crawler_running_event.is_set():
+    if not utils.state.is_running():
         logger.info("Scraping stopped by user")
         return ""
     
@@ -209,7 +280,7 @@ def process_pdf_ocr(pdf_url, base_url):
     
     try:
         full_url = urllib.parse.urljoin(base_url, pdf_url)
-        response = requests.get(full_url, headers=HEADERS, timeout=15)
+        response = SESSION.get(full_url, timeout=15)
         if response.status_code != 200:
             logger.warning(f"Failed to download PDF {full_url}: Status {response.status_code}")
             return ""
@@ -250,16 +321,13 @@ def search_edurank(university_name):
         # Try direct university page URL
         slug = university_name.lower().replace(' ', '-').replace('&', 'and')
         direct_url = f"https://edurank.org/uni/{slug}/"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
         logger.info(f"Trying direct EduRank URL: {direct_url}")
-        response = requests.get(direct_url, headers=headers, timeout=10)
+        response = SESSION.get(direct_url, timeout=10)
         
         if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            score_tag = soup.find(string=re.compile(r'Ranked #\d+|#\d+', re.I))
-            score = re.search(r'#(\d+)', score_tag).group(1) if score_tag else None
+            soup = BeautifulSoup(response.text, 'lxml')
+            score_tag = soup.find(string=_RANK_RE)
+            score = _RANK_NUMBER_RE.search(score_tag).group(1) if score_tag else None
             if score:
                 logger.info(f"EduRank found: URL={direct_url}, Score={score}")
                 return direct_url, score
@@ -271,23 +339,23 @@ def search_edurank(university_name):
         google_query = f"site:edurank.org {university_name}"
         google_url = f"https://www.google.com/search?q={quote(google_query)}"
         logger.info(f"Falling back to Google search: {google_url}")
-        response = requests.get(google_url, headers=headers, timeout=10)
+        response = SESSION.get(google_url, timeout=10)
         
         if response.status_code != 200:
             logger.warning(f"Google search failed for {university_name}: Status {response.status_code}")
             return None, None
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(response.text, 'lxml')
         for link in soup.find_all('a', href=True):
             href = link['href']
             if 'edurank.org/uni/' in href:
                 edurank_url = href.split('&')[0]  # Clean URL from Google redirect
                 logger.info(f"Found EduRank URL via Google: {edurank_url}")
-                response = requests.get(edurank_url, headers=headers, timeout=10)
+                response = SESSION.get(edurank_url, timeout=10)
                 if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    score_tag = soup.find(string=re.compile(r'Ranked #\d+|#\d+', re.I))
-                    score = re.search(r'#(\d+)', score_tag).group(1) if score_tag else None
+                    soup = BeautifulSoup(response.text, 'lxml')
+                    score_tag = soup.find(string=_RANK_RE)
+                    score = _RANK_NUMBER_RE.search(score_tag).group(1) if score_tag else None
                     logger.info(f"EduRank found: URL={edurank_url}, Score={score}")
                     return edurank_url, score
                 logger.warning(f"EduRank URL failed: {edurank_url}")
@@ -311,15 +379,12 @@ def search_google_scholar(university_name, department_focus):
             query += f" {department_focus}"
         encoded_query = quote(query)
         search_url = f"https://scholar.google.com/scholar?q={encoded_query}"
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(search_url, headers=headers, timeout=10)
+        response = SESSION.get(search_url, timeout=10)
         if response.status_code != 200:
             logger.warning(f"Google Scholar search failed for {university_name}: Status {response.status_code}")
             return None
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(response.text, 'lxml')
         article = soup.find('div', class_='gs_r gs_or gs_scl')
         if article:
             link = article.find('a', href=True)
@@ -335,12 +400,12 @@ def search_google_scholar(university_name, department_focus):
 def find_publication_sections(soup):
     """Find sections likely containing publication information."""
     publication_sections = []
-    headers = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'], string=re.compile(r'publications|research papers|journal articles', re.I))
+    headers = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'], string=_PUB_HEADING_RE)
     for header in headers:
         section = header.find_parent(['section', 'div'])
         if section:
             publication_sections.append(section)
-    divs = soup.find_all('div', class_=re.compile(r'publications|research', re.I))
+    divs = soup.find_all('div', class_=_PUB_CLASS_RE)
     publication_sections.extend(divs)
     return publication_sections
 
@@ -352,10 +417,18 @@ def extract_publication_links(section):
         text = a.get_text(strip=True)
         if 'doi.org' in href or 'scholar.google' in href or 'pubmed' in href or 'ieee' in href or 'acm' in href:
             links.append((href, text))
-        elif re.search(r'paper|article|publication|journal', text.lower(), re.I) and not re.search(r'home|about|contact|news', href, re.I):
+        elif _PUB_TEXT_RE.search(text) and not _NON_PUB_HREF_RE.search(href):
             links.append((href, text))
     return links
 
+def _class_matches(tag, pattern):
+    """Same test as find_all(class_=pattern): any of the tag's classes matches."""
+    return pattern.search(' '.join(tag.get('class', ()))) is not None
+
+def _string_matches(tag, pattern):
+    """Same test as find_all(string=pattern): the tag's single string matches."""
+    return tag.string is not None and pattern.search(tag.string) is not None
+
 def extract_structured_data(soup, url):
     """Extract structured data, raw content, and OCR content from the soup object."""
     data = {
@@ -377,6 +450,11 @@ def extract_structured_data(soup, url):
         'ocr_content': []
     }
 
+    # Walk the document once; the sections below filter this list (in document
+    # order) instead of each re-walking the tree with its own find_all
+    elements = soup.find_all(True)
+    paragraph_texts = [el.get_text(strip=True) for el in elements if el.name == 'p']
+
     # University Name Extraction
     try:
         meta_title = soup.find('meta', attrs={'name': 'title'})
@@ -412,19 +490,19 @@ def extract_structured_data(soup, url):
 
     # Location Extraction with Schema.org Support
     try:
-        schema_tags = soup.find_all('script', type='application/ld+json')
+        schema_tags = [el for el in elements if el.name == 'script' and el.get('type') == 'application/ld+json']
         for tag in schema_tags:
             try:
-                schema_data = json.loads(tag.string)
+                schema_data = orjson.loads(tag.string)
                 if 'address' in schema_data:
                     address = schema_data['address']
                     data['location']['city'] = address.get('addressLocality', '')
                     data['location']['country'] = address.get('addressCountry', '')
                     break
-            except json.JSONDecodeError:
+            except (orjson.JSONDecodeError, TypeError):
                 continue
         if not data['location']['city']:
-            address_tags = soup.find_all(['address', 'div', 'p'], class_=re.compile(r'location|address|contact', re.I))
+            address_tags = [el for el in elements if el.name in ('address', 'div', 'p') and _class_matches(el, _ADDRESS_CLASS_RE)]
             for tag in address_tags:
                 text = tag.get_text(strip=True)
                 if 'country' in text.lower() or ',' in text:
@@ -441,7 +519,7 @@ def extract_structured_data(soup, url):
 
     # Department Extraction
     try:
-        dept_tags = soup.find_all(['h2', 'h3', 'div'], string=re.compile(r'department|faculty|school|centre', re.I))
+        dept_tags = [el for el in elements if el.name in ('h2', 'h3', 'div') and _string_matches(el, _DEPT_RE)]
         for tag in dept_tags:
             data['department']['name'] = tag.get_text(strip=True)
             link = tag.find_parent('a', href=True) or tag.find('a', href=True)
@@ -455,16 +533,16 @@ def extract_structured_data(soup, url):
 
     # Department Focus and Scopes
     try:
-        content = ' '.join(p.get_text(strip=True) for p in soup.find_all('p'))
-        focus_keywords = ['research', 'focus', 'specialize', 'study']
-        for keyword in focus_keywords:
-            if keyword in content.lower():
-                start = content.lower().find(keyword)
+        content = ' '.join(paragraph_texts)
+        content_lower = content.lower()
+        # Keywords are in priority order: the first one present wins, wherever it appears
+        for keyword in FOCUS_KEYWORDS:
+            start = content_lower.find(keyword)
+            if start != -1:
                 excerpt = content[start:start + 100]
                 data['department']['focus'] = excerpt.strip()
                 break
-        scopes = re.findall(r'\b(?:AI|machine learning|robotics|biology|physics|chemistry|solar|renewable energy|clean energy)\b', content, re.I)
-        data['scopes'] = list(set(scopes))
+        data['scopes'] = list(set(_SCOPES_RE.findall(content)))
     except Exception as e:
         logger.error(f"Error in department focus and scopes extraction for {url}: {e}")
 
@@ -483,7 +561,7 @@ def extract_structured_data(soup, url):
                 found_publications = True
         
         if not found_publications:
-            for a in soup.find_all('a', href=True):
+            for a in (el for el in elements if el.name == 'a' and el.get('href') is not None):
                 href = a['href'].lower()
                 text = a.get_text(strip=True)
                 if 'doi.org' in href or 'scholar.google' in href or 'pubmed' in href or 'ieee' in href or 'acm' in href:
@@ -493,7 +571,7 @@ def extract_structured_data(soup, url):
                         data['publications']['other_url'] = href
                     data['publications']['contents'].append(text)
                     found_publications = True
-                elif re.search(r'\b(paper|article|publication|journal)\b', text.lower(), re.I) and not re.search(r'home|about|contact|news', href, re.I):
+                elif _PUB_WORD_RE.search(text) and not _NON_PUB_HREF_RE.search(href):
                     data['publications']['other_url'] = href
                     data['publications']['contents'].append(text)
                     found_publications = True
@@ -509,14 +587,12 @@ def extract_structured_data(soup, url):
 
     # Point of Contact Extraction
     try:
-        email_pattern = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
-        phone_pattern = re.compile(r'\+?\d[\d -]{8,}\d')
-        contact_links = soup.find_all('a', string=re.compile(r'contact|staff|directory', re.I))
-        for tag in soup.find_all(['p', 'div', 'span']):
+        contact_links = [el for el in elements if el.name == 'a' and _string_matches(el, _CONTACT_LINK_RE)]
+        for tag in (el for el in elements if el.name in ('p', 'div', 'span')):
             text = tag.get_text(strip=True)
-            if email := email_pattern.search(text):
+            if email := _EMAIL_RE.search(text):
                 data['point_of_contact']['email'] = email.group(0)
-            if phone := phone_pattern.search(text):
+            if phone := _PHONE_RE.search(text):
                 data['point_of_contact']['phone_number'] = phone.group(0)
             if 'dr.' in text.lower() or 'prof.' in text.lower():
                 data['point_of_contact']['name'] = text.split(',')[0].strip()
@@ -532,7 +608,7 @@ def extract_structured_data(soup, url):
 
     # Research Abstract Extraction
     try:
-        abstract_sections = soup.find_all(['div', 'section'], class_=re.compile(r'about|research|overview', re.I))
+        abstract_sections = [el for el in elements if el.name in ('div', 'section') and _class_matches(el, _ABSTRACT_CLASS_RE)]
         for section in abstract_sections:
             paragraphs = section.find_all('p')
             for p in paragraphs:
@@ -543,8 +619,7 @@ def extract_structured_data(soup, url):
             if data['research_abstract']:
                 break
         if not data['research_abstract']:
-            for p in soup.find_all('p'):
-                text = p.get_text(strip=True)
+            for text in paragraph_texts:
                 if len(text) > 100:
                     data['research_abstract'] = text
                     break
@@ -553,7 +628,7 @@ def extract_structured_data(soup, url):
 
     # Lab Equipment Extraction
     try:
-        equip_tags = soup.find_all(['ul', 'div', 'table'], string=re.compile(r'equipment|lab|facility|instrument|apparatus', re.I))
+        equip_tags = [el for el in elements if el.name in ('ul', 'div', 'table') and _string_matches(el, _EQUIPMENT_RE)]
         for tag in equip_tags:
             data['lab_equipment']['overview'] = tag.get_text(strip=True)[:200]
             if tag.name == 'ul':
@@ -572,10 +647,12 @@ def extract_structured_data(soup, url):
     except Exception as e:
         logger.error(f"Error in raw content extraction for {url}: {e}")
 
-    # OCR Content Extraction
+    # OCR Content Extraction (skip the image and PDF scan entirely when OCR is off)
     try:
+        if not load_config().get('ENABLE_OCR', True):
+            return data
         images = soup.find_all('img', src=True)
-        pdfs = soup.find_all('a', href=re.compile(r'\.pdf$', re.I))
+        pdfs = soup.find_all('a', href=_PDF_HREF_RE)
         for img in images:
             img_src = img['src']
             if img_src:
@@ -595,7 +672,7 @@ def extract_structured_data(soup, url):
 
 def scrape_with_bs(url):
     """Enhanced static scraper with structured data, raw content, and OCR extraction"""
-    if not utils.state.crawler_running_event.is_set():
+    if not utils.state.is_running():
         logger.info("Scraping stopped by user")
         return None
     
@@ -603,9 +680,9 @@ def scrape_with_bs(url):
     timeout = config.get('REQUEST_TIMEOUT', 15000) / 1000  # Convert ms to seconds
     logger.info(f"Scraping static website: {url}")
     try:
-        response = requests.get(url, headers=HEADERS, timeout=timeout)
+        response = SESSION.get(url, timeout=timeout)
         response.encoding = response.apparent_encoding 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(response.text, 'lxml')
         data = extract_structured_data(soup, url)
         logger.info(f"Successfully scraped {url} (Fields extracted: {len(data)}, Raw content length: {len(data['raw_content'])}, OCR items: {len(data['ocr_content'])})")
         return data
@@ -613,43 +690,159 @@ def scrape_with_bs(url):
         logger.error(f"Error scraping {url}: {e}")
         return None
 
+async def _scrape_with_bs_async(session: aiohttp.ClientSession, url, timeout):
+    if not utils.state.is_running():
+        logger.info("Scraping stopped by user")
+        return None
+
+    logger.info(f"Scraping static website: {url}")
+    try:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            body = await response.read()
+        # Bytes let BeautifulSoup detect the encoding, like apparent_encoding does
+        # for scrape_with_bs; parsing and extraction run off the event loop
+        soup = await asyncio.to_thread(BeautifulSoup, body, 'lxml')
+        data = await asyncio.to_thread(extract_structured_data, soup, url)
+        logger.info(f"Successfully scraped {url} (Fields extracted: {len(data)}, Raw content length: {len(data['raw_content'])}, OCR items: {len(data['ocr_content'])})")
+        return data
+    except Exception as e:
+        logger.error(f"Error scraping {url}: {e}")
+        return None
+
+async def _scrape_with_bs_all(urls):
+    config = load_config()
+    timeout = config.get('REQUEST_TIMEOUT', 15000) / 1000  # Convert ms to seconds
+    connector = aiohttp.TCPConnector(limit=BATCH_MAX_CONNECTIONS, limit_per_host=BATCH_MAX_PER_HOST, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector) as session:
+        return await asyncio.gather(*(_scrape_with_bs_async(session, url, timeout) for url in urls))
+
+def scrape_with_bs_batch(urls):
+    """Scrape several static pages concurrently; results (or None) in the order of urls."""
+    if not urls:
+        return []
+    return asyncio.run(_scrape_with_bs_all(urls))
+
+# One headless Chrome reused by every dynamic scrape; launching a browser per
+# URL cost more than most page loads. Closed when the last workflow run using
+# it ends (see selenium_driver_in_use).
+SELENIUM_LOCK = Lock()
+SELENIUM_DRIVER = None
+# Workflow runs currently sharing the driver (see selenium_driver_in_use)
+_SELENIUM_USERS = 0
+_SELENIUM_USERS_LOCK = Lock()
+
+# After each scroll, wait until the page has requested no new resources for
+# NETWORK_IDLE_SECONDS, giving up after SCROLL_WAIT_SECONDS (the old fixed sleep,
+# so a page that never settles costs no more than before)
+NETWORK_IDLE_SECONDS = 0.2
+SCROLL_WAIT_SECONDS = 1
+NETWORK_POLL_SECONDS = 0.05
+_RESOURCE_COUNT_JS = "return performance.getEntriesByType('resource').length"
+
+def _wait_for_network_idle(driver):
+    """Return once lazy-loaded content has settled (or the crawl is stopped)."""
+    deadline = time.monotonic() + SCROLL_WAIT_SECONDS
+    last_count, since = None, time.monotonic()
+    while True:
+        count = driver.execute_script(_RESOURCE_COUNT_JS)
+        now = time.monotonic()
+        if count != last_count:
+            last_count, since = count, now
+        elif now - since >= NETWORK_IDLE_SECONDS:
+            return
+        if now >= deadline:
+            logger.debug(f"Page still loading after {SCROLL_WAIT_SECONDS}s of scrolling wait")
+            return
+        # Sleeps between polls, but wakes as soon as Stop is pressed
+        if utils.state.wait_for_stop(NETWORK_POLL_SECONDS):
+            return
+
+def _selenium_driver():
+    """Return the shared driver, starting Chrome on first use. Call with SELENIUM_LOCK held."""
+    global SELENIUM_DRIVER
+    if SELENIUM_DRIVER is None:
+        options = Options()
+        options.add_argument("--headless")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        SELENIUM_DRIVER = webdriver.Chrome(options=options)
+        logger.info("Started shared Selenium driver for scraping")
+    return SELENIUM_DRIVER
+
+def _quit_selenium_driver():
+    global SELENIUM_DRIVER
+    if SELENIUM_DRIVER is not None:
+        try:
+            SELENIUM_DRIVER.quit()
+        except Exception as e:
+            logger.warning(f"Error closing Selenium driver: {e}")
+        SELENIUM_DRIVER = None
+
+@contextlib.contextmanager
+def selenium_driver_in_use():
+    """Mark a workflow run as a user of the shared driver; the last run to finish closes it.
+
+    A quick scrape ending mid-crawl used to quit the browser the full crawl was
+    still using, which then paid for a cold Chrome start.
+    """
+    global _SELENIUM_USERS
+    with _SELENIUM_USERS_LOCK:
+        _SELENIUM_USERS += 1
+    try:
+        yield
+    finally:
+        with _SELENIUM_USERS_LOCK:
+            _SELENIUM_USERS -= 1
+        with SELENIUM_LOCK:
+            # Re-checked under SELENIUM_LOCK in case another run started meanwhile
+            with _SELENIUM_USERS_LOCK:
+                if _SELENIUM_USERS == 0:
+                    _quit_selenium_driver()
+
 def scrape_with_selenium(url):
     """Enhanced dynamic scraper with structured data, raw content, and OCR extraction"""
-    if not utils.state.crawler_running_event.is_set():
+    if not utils.state.is_running():
         logger.info("Scraping stopped by user")
         return None
     
     logger.info(f"Scraping dynamic website: {url}")
     config = load_config()
     timeout = config.get('REQUEST_TIMEOUT', 15000) / 1000  # Convert ms to seconds
-    options = Options()
-    options.add_argument("--headless")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    
-    driver = webdriver.Chrome(options=options)
+    with SELENIUM_LOCK:
+        try:
+            driver = _selenium_driver()
+            driver.get(url)
+            
+            WebDriverWait(driver, timeout).until(
+                EC.presence_of_element_located((By.XPATH, '//body//*[text()]'))
+            )
+            
+            last_height = driver.execute_script("return document.body.scrollHeight")
+            for _ in range(3):
+                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                _wait_for_network_idle(driver)
+                if not utils.state.is_running():
+                    break
+                new_height = driver.execute_script("return document.body.scrollHeight")
+                if new_height == last_height:
+                    break
+                last_height = new_height
+            
+            page_source = driver.page_source
+        except TimeoutException:
+            logger.error(f"Error scraping {url}: no text rendered within {timeout}s")
+            return None
+        except Exception as e:
+            logger.error(f"Error scraping {url}: {e}")
+            # The browser may be wedged or gone; start a fresh one next time
+            _quit_selenium_driver()
+            return None
+
     try:
-        driver.get(url)
-        
-        WebDriverWait(driver, timeout).until(
-            EC.presence_of_element_located((By.XPATH, '//body//*[text()]'))
-        )
-        
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        for _ in range(3):
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            if new_height == last_height:
-                break
-            last_height = new_height
-        
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
+        soup = BeautifulSoup(page_source, 'lxml')
         data = extract_structured_data(soup, url)
         logger.info(f"Successfully scraped {url} (Fields extracted: {len(data)}, Raw content length: {len(data['raw_content'])}, OCR items: {len(data['ocr_content'])})")
         return data
     except Exception as e:
         logger.error(f"Error scraping {url}: {e}")
         return None
-    finally:
-        driver.quit()
\ No newline at end of file
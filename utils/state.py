@@ -1,4 +1,83 @@
+import contextlib
+import contextvars
+import os
+import tempfile
 import threading
+from filelock import FileLock, Timeout
 
 crawler_running_event = threading.Event() 
-crawler_thread = None
\ No newline at end of file
+# The event the current run checks: crawler_running_event for full crawls, or
+# one of its own for a quick scrape so it can neither stop nor block a full crawl.
+_run_event = contextvars.ContextVar('run_event', default=crawler_running_event)
+# Notified whenever crawler_running_event is cleared, so waits inside the
+# crawl end as soon as a stop is requested.
+crawler_stop_cv = threading.Condition()
+# Held across the check-and-start in run_crawler so two requests can't both start a crawl.
+_start_lock = threading.Lock()
+
+# crawler_running_event only covers the current process; this lock file
+# keeps a second gunicorn worker from starting a crawl of its own.
+CRAWLER_LOCK_FILE = os.path.join(tempfile.gettempdir(), 'labs_startups_crawler.lock')
+_crawler_lock = FileLock(CRAWLER_LOCK_FILE, thread_local=False)
+
+# Session of the full crawl holding the lock, kept next to the lock file so a
+# stop request handled by another worker flags that session and no other.
+CRAWLER_SESSION_FILE = CRAWLER_LOCK_FILE + '.session'
+
+def set_crawl_session(session_id):
+    """Record the session of the crawl holding the crawler lock, or forget it when None."""
+    if session_id is None:
+        try:
+            os.remove(CRAWLER_SESSION_FILE)
+        except FileNotFoundError:
+            pass
+        return
+    with open(CRAWLER_SESSION_FILE, 'w', encoding='utf-8') as f:
+        f.write(str(session_id))
+
+def crawl_session():
+    """Id of the session whose full crawl is running in any worker, or None."""
+    try:
+        with open(CRAWLER_SESSION_FILE, encoding='utf-8') as f:
+            return int(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+def acquire_crawler_lock():
+    """Claim the crawl for this process; False if another process already holds it."""
+    try:
+        _crawler_lock.acquire(timeout=0)
+        return True
+    except Timeout:
+        return False
+
+def release_crawler_lock():
+    """Release the crawl lock taken by acquire_crawler_lock()."""
+    if _crawler_lock.is_locked:
+        _crawler_lock.release()
+
+def request_stop():
+    """Clear crawler_running_event and wake every thread blocked in wait_for_stop()."""
+    with crawler_stop_cv:
+        crawler_running_event.clear()
+        crawler_stop_cv.notify_all()
+
+def wait_for_stop(timeout):
+    """Sleep up to timeout seconds, returning early (True) once the current run has been stopped."""
+    event = _run_event.get()
+    with crawler_stop_cv:
+        crawler_stop_cv.wait_for(lambda: not event.is_set(), timeout=timeout)
+    return not event.is_set()
+
+def is_running():
+    """Whether the run on this thread (or task) may keep going."""
+    return _run_event.get().is_set()
+
+@contextlib.contextmanager
+def bind_run_event(event):
+    """Make is_running() follow event for the code run inside the block."""
+    token = _run_event.set(event)
+    try:
+        yield event
+    finally:
+        _run_event.reset(token)
@@ -1,18 +1,29 @@
 from langgraph.graph import StateGraph, END
+from langgraph.types import Send
 from pydantic import BaseModel
-from typing import List, Optional, Tuple
+from typing import Annotated, List, Optional, Tuple
 from asgiref.sync import sync_to_async
 from utils.helpers import load_seed_urls
-from utils.scrapers import is_static, scrape_with_bs, scrape_with_selenium
-from utils.extractors import extract_info_with_llm
-from utils.database import store_data, url_exists_in_db
+from utils.scrapers import is_static, scrape_with_bs_batch, scrape_with_selenium
+from utils.extractors import extract_info_with_llm_batch
+from utils.database import buffer_entity, url_exists_in_db
 from utils.online_crawler_model import OnlineLearningCrawler
+import asyncio
+import functools
 import random
 import logging
+import utils.state
 
 logger = logging.getLogger(__name__)
 online_learner = OnlineLearningCrawler(model_file='models/online_model.pkl', scaler_file='models/scaler.pkl')
 
+# URLs scraped and extracted concurrently per round of the graph
+URL_BATCH_SIZE = 4
+
+def _add_or_clear(current: list, update: Optional[list]) -> list:
+    """Reducer for State.results: each process_url branch appends, None clears."""
+    return [] if update is None else current + update
+
 class State(BaseModel):
     urls: List[Tuple[str, str]]
     index: int = 0
@@ -24,6 +35,8 @@ class State(BaseModel):
     errors: List[str] = []
     session: Optional[object] = None
     quick_scrape: bool = False  # Track quick scrape mode
+    batch: List[Tuple[str, str]] = []  # (url, anchor_text) being processed this round
+    results: Annotated[List[dict], _add_or_clear] = []  # Per-URL outcomes of the round
 
 def initialize(state: State) -> State:
     logger.info("Initializing workflow...")
@@ -39,33 +52,33 @@ def initialize(state: State) -> State:
 
 def check_urls(state: State) -> State:
     logger.info(f"Checking URLs (index {state.index}/{len(state.urls)})")
-    if state.index >= len(state.urls):
+    state.batch = []
+    while state.index < len(state.urls) and len(state.batch) < URL_BATCH_SIZE:
+        url, anchor_text = state.urls[state.index]
+        state.index += 1
+        logger.debug(f"Processing URL: {url}, anchor_text: {anchor_text}")
+        if not state.quick_scrape:  # Skip DB check for quick scrape
+            try:
+                # Run url_exists_in_db synchronously
+                exists = url_exists_in_db(url)
+                if exists:
+                    logger.info(f"Skipping duplicate URL: {url}")
+                    continue
+            except Exception as e:
+                logger.error(f"Error checking URL {url} in database: {str(e)}")
+                state.errors.append(f"DB check failed for {url}: {str(e)}")
+                continue
+        state.batch.append((url, anchor_text))
+    if not state.batch:
         logger.info("No more URLs to process, setting status to finished")
         state.status = "finished"
         return state
-    url, anchor_text = state.urls[state.index]
-    logger.debug(f"Processing URL: {url}, anchor_text: {anchor_text}")
-    if not state.quick_scrape:  # Skip DB check for quick scrape
-        try:
-            # Run url_exists_in_db synchronously
-            exists = url_exists_in_db(url)
-            if exists:
-                logger.info(f"Skipping duplicate URL: {url}")
-                state.index += 1
-                return state
-        except Exception as e:
-            logger.error(f"Error checking URL {url} in database: {str(e)}")
-            state.errors.append(f"DB check failed for {url}: {str(e)}")
-            state.status = "error"
-            state.index += 1
-            return state
     # In quick_scrape mode, always select the URL
-    prob = online_learner.predict(url, anchor_text, parent_relevance=1)
+    probs = online_learner.predict_batch([(url, anchor_text, 1) for url, anchor_text in state.batch])
     trained_enough = online_learner.total_updates >= 100
-    logger.debug(f"URL {url} relevance prob: {prob:.2f}, trained_enough: {trained_enough}")
-    state.current_url = url
+    for (url, _), prob in zip(state.batch, probs):
+        logger.info(f"Selected URL: {url} (prob: {prob:.2f}, trained_enough: {trained_enough})")
     state.status = "processing"
-    logger.info(f"Selected URL: {url} (prob: {prob:.2f})")
     return state
 
 def detect_type(state: State) -> State:
@@ -81,38 +94,66 @@ def detect_type(state: State) -> State:
     return state
 
 def scrape(state: State) -> State:
+    """Load a dynamic page with Selenium; static pages are left to scrape_static."""
+    if state.is_static:
+        return state
     logger.info(f"Scraping URL: {state.current_url}, is_static: {state.is_static}")
     try:
-        if state.is_static:
-            state.scraped_data = scrape_with_bs(state.current_url)
-        else:
-            state.scraped_data = scrape_with_selenium(state.current_url)
-        if not state.scraped_data:
-            # Fallback to BeautifulSoup if Selenium fails
-            logger.warning(f"Selenium failed for {state.current_url}, trying BeautifulSoup")
-            state.scraped_data = scrape_with_bs(state.current_url)
-        if not state.scraped_data:
-            error_msg = f"No content extracted for {state.current_url}"
-            logger.warning(error_msg)
-            raise ValueError(error_msg)
-        logger.debug(f"Scraped data for {state.current_url}: {state.scraped_data}")
+        state.scraped_data = scrape_with_selenium(state.current_url)
     except Exception as e:
-        error_msg = f"Scraping failed for {state.current_url}: {str(e)}"
-        logger.error(error_msg)
-        state.errors.append(error_msg)
-        state.status = "error"
+        logger.error(f"Selenium error for {state.current_url}: {str(e)}")
         state.scraped_data = None
+    if not state.scraped_data:
+        # Fallback to BeautifulSoup if Selenium fails
+        logger.warning(f"Selenium failed for {state.current_url}, trying BeautifulSoup")
     return state
 
-def extract_data(state: State) -> State:
+def scrape_static(states: List[State]) -> List[State]:
+    """Scrape the round's static pages, and those Selenium could not load, in one concurrent batch."""
+    pending = [state for state in states if not state.scraped_data]
+    for state in pending:
+        logger.info(f"Scraping URL: {state.current_url}, is_static: {state.is_static}")
+    try:
+        pages = scrape_with_bs_batch([state.current_url for state in pending])
+    except Exception as e:
+        logger.error(f"Static batch scrape failed: {str(e)}")
+        pages = [None] * len(pending)
+    for state, page in zip(pending, pages):
+        state.scraped_data = page
+        if not page:
+            error_msg = f"No content extracted for {state.current_url}"
+            logger.warning(error_msg)
+            error_msg = f"Scraping failed for {state.current_url}: {error_msg}"
+            logger.error(error_msg)
+            state.errors.append(error_msg)
+            state.status = "error"
+        else:
+            logger.debug(f"Scraped data for {state.current_url}: {state.scraped_data}")
+    return states
+
+def extract_data(states: List[State]) -> List[State]:
+    """Extract every scraped page of the round with one batched LLM call."""
+    scraped = [state.scraped_data for state in states if state.scraped_data]
+    try:
+        extracted = asyncio.run(extract_info_with_llm_batch(scraped)) if scraped else []
+    except Exception as e:
+        extracted = [e] * len(scraped)
+    extracted = iter(extracted)
+    for state in states:
+        _check_extracted(state, next(extracted) if state.scraped_data else None)
+    return states
+
+def _check_extracted(state: State, extracted_data) -> State:
     logger.info(f"Extracting data for URL: {state.current_url}")
     logger.debug(f"Input scraped_data: {state.scraped_data}")
     try:
         if state.scraped_data:
-            state.extracted_data = extract_info_with_llm(state.scraped_data)
+            if isinstance(extracted_data, Exception):
+                raise extracted_data
+            state.extracted_data = extracted_data
             logger.debug(f"Extracted data: {state.extracted_data}")
             if state.extracted_data is None:
-                error_msg = f"extract_info_with_llm returned None for {state.current_url}"
+                error_msg = f"extract_info_with_llm_batch returned None for {state.current_url}"
                 logger.warning(error_msg)
                 raise ValueError(error_msg)
             if "error" in state.extracted_data:
@@ -157,9 +198,9 @@ def store_data_node(state: State) -> State:
             logger.info(f"Skipping storage for {state.current_url}: All fields are empty")
         else:
             try:
-                logger.info(f"Calling store_data with URL: {state.current_url}, session: {state.session}")
-                store_data(state.current_url, state.extracted_data, session=state.session)
-                logger.info(f"Successfully stored data for {state.current_url}")
+                logger.info(f"Buffering data for URL: {state.current_url}, session: {state.session}")
+                buffer_entity(state.current_url, state.extracted_data, session=state.session)
+                logger.info(f"Queued data for {state.current_url}")
             except Exception as e:
                 error_msg = f"Storage failed for {state.current_url}: {str(e)}"
                 logger.error(error_msg)
@@ -225,45 +266,93 @@ def update_model(state: State) -> State:
         logger.info(f"Updated model for {url}: label={label}, populated_fields={populated_fields}")
     return state
 
-def increment_index(state: State) -> State:
-    logger.info(f"Incrementing index to {state.index + 1} for URL: {state.current_url}")
-    state.index += 1
-    state.current_url = None
-    state.is_static = None
-    state.scraped_data = None
-    state.extracted_data = None
-    state.status = "processing"
-    return state
+def _unless_stopped(node):
+    """Turn node into a no-op once a stop is requested; check_urls then ends the run.
+
+    Without this a stopped crawl kept walking the remaining URLs, each one
+    failing to scrape and being fed to the online model as irrelevant.
+    """
+    @functools.wraps(node)
+    def wrapper(state: State) -> State:
+        if not utils.state.is_running():
+            if state.status != "stopped":
+                logger.info(f"Workflow stopped by user before {node.__name__}")
+                state.status = "stopped"
+            return state
+        return node(state)
+    return wrapper
+
+# Per-URL steps, run in order inside process_url
+_URL_STEPS = tuple(_unless_stopped(step) for step in (detect_type, scrape))
+# Round-level steps, run in order by record_results over the whole batch
+_ROUND_STEPS = (scrape_static, extract_data)
+
+def dispatch_batch(state: State):
+    """Fan the round's batch out to one process_url branch per URL, or end the run."""
+    logger.debug(f"Routing after check_urls, status: {state.status}, batch: {state.batch}")
+    if state.status in ("finished", "stopped"):
+        return END
+    return [
+        Send("process_url", {"url": url, "anchor_text": anchor_text, "session": state.session, "quick_scrape": state.quick_scrape})
+        for url, anchor_text in state.batch
+    ]
+
+def process_url(task: dict) -> dict:
+    """Detect one URL and, if it is dynamic, load it with Selenium; the batch's branches run concurrently."""
+    url_state = State(
+        urls=[(task["url"], task["anchor_text"])],
+        current_url=task["url"],
+        session=task["session"],
+        quick_scrape=task["quick_scrape"],
+        status="processing",
+    )
+    for step in _URL_STEPS:
+        url_state = step(url_state)
+    return {"results": [{
+        "url": task["url"],
+        "anchor_text": task["anchor_text"],
+        "status": url_state.status,
+        "scraped_data": url_state.scraped_data,
+        "errors": url_state.errors,
+    }]}
+
+def record_results(state: State) -> dict:
+    """Scrape the round's static pages and extract all of them in batches, then store each page and train the online model on it."""
+    url_states = [
+        State(
+            urls=[(result["url"], result["anchor_text"])],
+            current_url=result["url"],
+            session=state.session,
+            status=result["status"],
+            scraped_data=result["scraped_data"],
+            errors=result["errors"],
+        )
+        for result in state.results
+    ]
+    for step in _ROUND_STEPS:
+        if not utils.state.is_running():
+            logger.info(f"Workflow stopped by user before {step.__name__}")
+            for url_state in url_states:
+                url_state.status = "stopped"
+            break
+        url_states = step(url_states)
+    errors = list(state.errors)
+    for url_state in url_states:
+        # Always store: a page extracted just before the stop is kept, not thrown away
+        url_state = store_data_node(url_state)
+        if url_state.status != "stopped":
+            url_state = update_model(url_state)
+        errors.extend(url_state.errors)
+    return {"results": None, "batch": [], "errors": errors}
 
 graph = StateGraph(State)
 graph.add_node("initialize", initialize)
-graph.add_node("check_urls", check_urls)
-graph.add_node("detect_type", detect_type)
-graph.add_node("scrape", scrape)
-graph.add_node("extract_data", extract_data)
-graph.add_node("store_data", store_data_node)
-graph.add_node("update_model", update_model)
-graph.add_node("increment_index", increment_index)
+graph.add_node("check_urls", _unless_stopped(check_urls))
+graph.add_node("process_url", process_url)
+graph.add_node("record_results", record_results)
 graph.set_entry_point("initialize")
 graph.add_edge("initialize", "check_urls")
-
-def route_after_check(state: State):
-    logger.debug(f"Routing after check_urls, status: {state.status}, current_url: {state.current_url}")
-    if state.status == "finished":
-        return END
-    if state.status == "error" or state.current_url is None:
-        return "increment_index"
-    return "detect_type"
-
-graph.add_conditional_edges(
-    "check_urls",
-    route_after_check,
-    {"detect_type": "detect_type", "increment_index": "increment_index", END: END}
-)
-graph.add_edge("detect_type", "scrape")
-graph.add_edge("scrape", "extract_data")
-graph.add_edge("extract_data", "store_data")
-graph.add_edge("store_data", "update_model")
-graph.add_edge("update_model", "increment_index")
-graph.add_edge("increment_index", "check_urls")
-app = graph.compile()
\ No newline at end of file
+graph.add_conditional_edges("check_urls", dispatch_batch, ["process_url", END])
+graph.add_edge("process_url", "record_results")
+graph.add_edge("record_results", "check_urls")
+app = graph.compile()